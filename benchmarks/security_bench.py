@@ -0,0 +1,205 @@
+"""
+Benchmark and regression check for the security hot path: protect_outgoing +
+accept_incoming over the frame mix LinkChat actually sends.
+
+    python -m benchmarks.security_bench [--seconds 0.3] [--repeat 3]
+    python -m benchmarks.security_bench --save-baseline      # record benchmarks/security_baseline.json
+    python -m benchmarks.security_bench --check              # exit 1 on regression
+
+Each cipher suite runs in two modes: "session" (keys from SEC_HELLO, counter nonces,
+replay window) and "psk" (per-frame HKDF keys, used for broadcast and before a session
+is up). For every payload kind and the weighted mix it reports frames/s, MB/s and
+p50/p99 latency of one protect + accept round trip. Every row is the best of --repeat
+runs, which keeps scheduler noise on shared machines out of the comparison.
+
+Baselines store a score = (1 / p50 latency) divided by a SHA-256 calibration loop
+measured in the same run, so a baseline recorded on one machine stays meaningful on
+another (the median ignores preemption spikes that move frames/s around);
+--check fails when any score drops more than --tolerance below its baseline.
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.enums.enums import MessageType  # noqa: E402
+from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema  # noqa: E402
+from src.security.cipher_suites import build_suites  # noqa: E402
+from src.security.security_handler import SecurityHandler  # noqa: E402
+from src.security.security_manager import SecurityManager  # noqa: E402
+
+SRC_MAC, DST_MAC = "02:00:00:00:00:0a", "02:00:00:00:00:0b"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "security_baseline.json")
+
+# kind -> (message type, payload bytes, share of the mix)
+PAYLOADS = {
+    "data": (MessageType.FILE_DATA, 1200, 0.6),
+    "ack": (MessageType.ACK, 30, 0.3),
+    "chat": (MessageType.APP_MESSAGE, 200, 0.1),
+}
+
+
+def _frame(message_type: MessageType, size: int, src: str = SRC_MAC, dst: str = DST_MAC) -> FrameSchema:
+    payload = os.urandom(size)
+    return FrameSchema(
+        dst_mac=dst, src_mac=src, ethertype=0x88B5,
+        header=HeaderSchema(message_type=message_type, sequence=1, payload_len=size),
+        payload=payload,
+    )
+
+
+def _managers(version: int, mode: str):
+    """Sender/receiver pair using only `version`; in session mode the handshake is completed."""
+    os.environ["SEC_SUITES"] = str(version)
+    os.environ["SEC_CIPHER_VERSION"] = str(version)
+    os.environ["SEC_KS_POOL"] = "0"     # measure the inline path, no background thread
+    os.environ["SEC_SESSIONS"] = "1" if mode == "session" else "0"
+    tx = SecurityManager(pre_shared_key=b"bench-psk", sec_handler=SecurityHandler())
+    rx = SecurityManager(pre_shared_key=b"bench-psk", sec_handler=SecurityHandler())
+    if mode == "session":
+        to_rx, to_tx = [], []
+        tx.bind_sender(to_rx.append)
+        rx.bind_sender(to_tx.append)
+        tx.protect_outgoing(_frame(MessageType.APP_MESSAGE, 8))     # triggers SEC_HELLO init
+        rx.accept_incoming(to_rx.pop())
+        tx.accept_incoming(to_tx.pop())
+        if tx.sessions.tx(DST_MAC) is None:
+            raise RuntimeError("session handshake did not complete")
+    return tx, rx
+
+
+def _calibrate(seconds: float, repeat: int) -> float:
+    """SHA-256 calls/s over 1 KB (best of `repeat`): the machine-speed reference for scores."""
+    block = os.urandom(1024)
+    best = 0.0
+    for _ in range(repeat):
+        n, start = 0, time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            for _ in range(256):
+                hashlib.sha256(block).digest()
+            n += 256
+        best = max(best, n / (time.perf_counter() - start))
+    return best
+
+
+def _run(tx: SecurityManager, rx: SecurityManager, frames, seconds: float) -> dict:
+    """Round trips over `frames` (cycled) for ~seconds; throughput and latency percentiles."""
+    latencies = []
+    nbytes = 0
+    clock = time.perf_counter
+    gc.disable()
+    start = clock()
+    deadline = start + seconds
+    i = 0
+    while True:
+        frame = frames[i % len(frames)]
+        t0 = clock()
+        out = rx.accept_incoming(tx.protect_outgoing(frame))
+        t1 = clock()
+        if out is None:
+            raise RuntimeError("frame failed to verify")
+        latencies.append(t1 - t0)
+        nbytes += len(frame.payload)
+        i += 1
+        if t1 >= deadline:
+            break
+    elapsed = clock() - start
+    gc.enable()
+    latencies.sort()
+    return {
+        "frames_s": round(i / elapsed),
+        "MBps": round(nbytes / elapsed / 1e6, 2),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 1),
+    }
+
+
+def _best(tx: SecurityManager, rx: SecurityManager, frames, seconds: float, repeat: int) -> dict:
+    return min((_run(tx, rx, frames, seconds) for _ in range(repeat)), key=lambda row: row["p50_us"])
+
+
+def _score(row: dict, calibration: float) -> float:
+    return 1e6 / row["p50_us"] / calibration
+
+
+def run_all(seconds: float, repeat: int) -> dict:
+    results = {}
+    for version, suite in build_suites(SecurityHandler()).items():
+        for mode in ("session", "psk"):
+            tx, rx = _managers(version, mode)
+            profile = f"{suite.name}/{mode}"
+            for kind, (message_type, size, _share) in PAYLOADS.items():
+                results[f"{profile}/{kind}"] = _best(tx, rx, [_frame(message_type, size)], seconds, repeat)
+            # Weighted mix, shuffled so branch/caching effects resemble real traffic
+            mix = [_frame(mt, size) for mt, size, share in PAYLOADS.values() for _ in range(int(share * 100))]
+            random.Random(0).shuffle(mix)
+            results[f"{profile}/mix"] = _best(tx, rx, mix, seconds, repeat)
+    return results
+
+
+def check(results: dict, calibration: float, baseline: dict, tolerance: float) -> list:
+    """Rows whose score fell more than `tolerance` below the baseline."""
+    failures = []
+    for name, base in baseline.get("results", {}).items():
+        row = results.get(name)
+        if row is None:
+            failures.append(f"{name}: missing from this run")
+            continue
+        score = _score(row, calibration)
+        if score < base["score"] * (1 - tolerance):
+            failures.append(f"{name}: score {score:.4f} < baseline {base['score']:.4f} (-{1 - score / base['score']:.0%})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=0.3, help="time per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per row, the best one is kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="compare with the baseline, exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed score drop (0.3 = 30%%)")
+    args = parser.parse_args(argv)
+
+    calibration = _calibrate(args.seconds, args.repeat)
+    results = run_all(args.seconds, args.repeat)
+
+    print(f"{'profile':<42} {'frames/s':>9} {'MB/s':>7} {'p50 us':>7} {'p99 us':>7}")
+    for name, row in results.items():
+        print(f"{name:<42} {row['frames_s']:>9} {row['MBps']:>7.2f} {row['p50_us']:>7.1f} {row['p99_us']:>7.1f}")
+
+    if args.save_baseline:
+        baseline = {
+            "calibration_sha256_1k_s": round(calibration),
+            "results": {name: {**row, "score": round(_score(row, calibration), 4)} for name, row in results.items()},
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+
+    if args.check:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"\nno baseline at {args.baseline}; run with --save-baseline first")
+            return 2
+        failures = check(results, calibration, baseline, args.tolerance)
+        if failures:
+            print("\nREGRESSION:")
+            for line in failures:
+                print("  " + line)
+            return 1
+        print(f"\nok: {len(baseline.get('results', {}))} rows within {args.tolerance:.0%} of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
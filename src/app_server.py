@@ -12,7 +12,10 @@ from typing import Optional, Dict, Any
 from src.messaging.service_messaging import Messaging
 from src.core.managers.raw_socket import SocketManager
 from src.core.managers.service_threads import ThreadManager
+from src.core.managers.job_manager import JobManager
+from src.core.schemas.job import Job
 from src.discover.discover import Discovery
+from src.core.enums.enums import FileTxState
 from src.prepare.network_config import get_runtime_config
 from src.file_transfer.handlers.file_transfer_handler import FileTransferHandler
 from src.file_transfer.file_sender import FileSender
@@ -20,7 +23,8 @@ from src.file_transfer.file_receiver import FileReceiver
 from src.security.security_handler import SecurityHandler
 from src.security.security_manager import SecurityManager
 
-from src.file_transfer.handlers.ui_events import set_sinks
+from src.file_transfer.handlers.ui_events import set_sinks, set_tx_sinks
+from src.file_transfer.helpers.progress_aggregator import ProgressAggregator
 
 try:
     from ipc.ipc_server import IPCServer
@@ -31,18 +35,32 @@ except Exception:
 DEFAULT_SOCK_DIR = os.environ.get("IPC_DIR", "/ipc")
 DEFAULT_SOCK_NAME = os.environ.get("IPC_NAME", "linkchat")
 DEFAULT_BASE_DIR = os.environ.get("BASE_DIR", "/shared")
+DEFAULT_CHUNK_SIZE = 1200
 
 
-def _neighbors_snapshot(neighbors: Dict[str, Dict[str, Any]]):
-    now = time.time()
-    rows = []
-    for mac, meta in list(neighbors.items()):
-        rows.append({
-            "mac": mac,
-            "alias": meta.get("alias", "?"),
-            "last_seen_ms": int(1000 * max(0.0, now - meta.get("last_seen", 0.0))),
-        })
-    return {"type": "neighbors_changed", "rows": rows}
+def _neighbors_snapshot(discovery: Discovery):
+    # Tabla completa: solo a pedido (bootstrap/resync); los cambios viajan como neighbors_diff
+    rev, rows = discovery.snapshot()
+    return {"type": "neighbors_changed", "rev": rev, "rows": rows}
+
+
+def _parse_weight(raw: Any, default: Optional[float] = 1.0) -> Optional[float]:
+    try:
+        w = float(raw)
+    except (TypeError, ValueError):
+        return default
+    return w if w > 0 else default
+
+
+def _ack_params(cmd: Dict[str, Any]) -> Dict[str, int]:
+    # Política de ACK diferido pedida para la transferencia (0 = la del receptor)
+    out = {}
+    for key in ("ack_every", "ack_delay_ms"):
+        try:
+            out[key] = max(0, int(cmd.get(key) or 0))
+        except (TypeError, ValueError):
+            out[key] = 0
+    return out
 
 
 def _resolve_socket_path(alias: str) -> str:
@@ -54,7 +72,8 @@ class AppServer:
     """
     Orquestador backend:
       - Levanta raw socket, threads, discovery, messaging, seguridad, IPC UDS.
-      - Expone comandos por IPC (send_text, send_text_all, file_send, folder_send...).
+      - Expone comandos por IPC (send_text, send_text_all, file_send, folder_send, job_*...).
+        Los comandos pesados corren como jobs: se responde {"job_id"} y el cierre llega como job_finished.
       - Publica eventos a la UI: chat, vecinos y file_tx_* / file_rx_*.
     """
     def __init__(
@@ -99,6 +118,7 @@ class AppServer:
         self.file_sender: Optional[FileSender] = None
         self.file_receiver: Optional[FileReceiver] = None
         self._files_out: Dict[str, Dict[str, Any]] = {}
+        self._tx_progress = ProgressAggregator.from_env()
         self._file_poll_thread: Optional[threading.Thread] = None
 
         # IPC
@@ -109,6 +129,12 @@ class AppServer:
 
         self.security: SecurityManager | None = None
 
+        # Comandos pesados del IPC (file_send, folder_send) fuera del loop asyncio
+        self.jobs = JobManager(
+            max_workers=int(os.environ.get("IPC_JOB_WORKERS", "2")),
+            on_finished=self._on_job_finished,
+        )
+
     #  IPC glue 
     def _emit_event(self, ev: Dict[str, Any]):
         if not (self.ipc and self._ipc_loop):
@@ -150,17 +176,17 @@ class AppServer:
                 active_since = cmd.get("active_since")
                 if isinstance(active_since, (int, float)) and active_since >= 0:
                     window = float(active_since)
+                    # Snapshot y filtro de vecinos elegibles
+                    neighbors = getattr(self.discovery, "neighbors", {}) or {}
+                    now = time.time()
+                    targets = [
+                        mac for mac, meta in list(neighbors.items())
+                        if (now - (meta or {}).get("last_seen", 0)) <= window
+                    ]
                 else:
-                    # por defecto, vecinos vistos en los últimos 60s 
-                    window = 60.0
-
-                # Snapshot y filtro de vecinos elegibles
-                neighbors = getattr(self.discovery, "neighbors", {}) or {}
-                now = time.time()
-                targets = [
-                    mac for mac, meta in list(neighbors.items())
-                    if (now - (meta or {}).get("last_seen", 0)) <= window
-                ]
+                    # por defecto, vecinos online o suspect (los expirados ya no están en la tabla)
+                    window = None
+                    targets = self.discovery.active_peers(include_suspect=True)
 
                 # Envía usando la API ya existente
                 if hasattr(self.messaging, "send_to_macs"):
@@ -176,9 +202,9 @@ class AppServer:
 
             #  Vecinos 
             if t in ("roster_get", "neighbors_get"):
-                return _neighbors_snapshot(self.discovery.neighbors)
+                return _neighbors_snapshot(self.discovery)
 
-            #  Envío de archivo 
+            #  Envío de archivo (job en segundo plano: hash + META no bloquean el loop)
             if t == "file_send":
                 # {"type":"file_send","dst":"aa:bb:...","path":"/abs/file"}
                 dst = cmd.get("dst") or cmd.get("dst_mac")
@@ -186,56 +212,203 @@ class AppServer:
                 if not (dst and path and os.path.exists(path)):
                     return {"ok": False, "error": "missing dst/path or not exists"}
 
-                if not self.file_sender:
-                    chunk_size = int(os.environ.get("CHUNK_SIZE", "1200"))
-                    self.file_sender = FileSender(self.th_mgr, chunk_size)
+                self._ensure_file_sender()
 
-                file_id = self.file_sender.send_file(path=path, dst_mac=dst)
-                meta = {"dst": dst, "path": path, "name": os.path.basename(path), "t0": time.time()}
-                self._files_out[file_id] = meta
+                job = self.jobs.submit("file_send", self._job_file_send, dst=dst, path=path,
+                                       weight=_parse_weight(cmd.get("weight")), **_ack_params(cmd))
+                return {"ok": True, "job_id": job.job_id}
 
-                # Evento TX start
-                self._emit_event({"type": "file_tx_started", "file_id": file_id, "dst": dst, "name": meta["name"]})
-                self._ensure_file_poller()
-                return {"ok": True, "file_id": file_id}
-
-            #  Envío de carpeta 
+            #  Envío de carpeta (job en segundo plano, archivo por archivo)
             if t == "folder_send":
                 dst = cmd.get("dst") or cmd.get("dst_mac")
                 folder = cmd.get("folder") or cmd.get("path")
                 if not (dst and folder and os.path.isdir(folder)):
                     return {"ok": False, "error": "missing dst/folder or not a directory"}
 
-                if not self.file_sender:
-                    chunk_size = int(os.environ.get("CHUNK_SIZE", "900"))
-                    self.file_sender = FileSender(self.th_mgr, chunk_size)
-
-                sent_list = self.file_sender.send_folder(folder_path=folder, dst_mac=dst)
-                files_resp = []
-                for file_id, rel in sent_list:
-                    path_abs = os.path.join(folder, rel)
-                    name = os.path.basename(rel) or os.path.basename(path_abs)
-                    meta = {"dst": dst, "path": path_abs, "name": name, "rel": rel, "t0": time.time()}
-                    self._files_out[file_id] = meta
-
-                    # Evento TX start con rel
-                    self._emit_event({
-                        "type": "file_tx_started",
-                        "file_id": file_id,
-                        "dst": dst,
-                        "name": name,
-                        "rel": rel,
-                    })
-                    files_resp.append({"file_id": file_id, "rel": rel})
-
-                self._ensure_file_poller()
-                return {"ok": True, "files": files_resp}
+                self._ensure_file_sender()
+
+                job = self.jobs.submit("folder_send", self._job_folder_send, dst=dst, folder=folder,
+                                       weight=_parse_weight(cmd.get("weight")), **_ack_params(cmd))
+                return {"ok": True, "job_id": job.job_id}
+
+            #  Peso de una transferencia en el reparto DRR
+            if t == "file_set_weight":
+                # {"type":"file_set_weight","file_id":"...","weight":4}
+                file_id = cmd.get("file_id")
+                weight = _parse_weight(cmd.get("weight"), None)
+                if not (file_id and weight):
+                    return {"ok": False, "error": "missing file_id/weight"}
+                if not (self.th_mgr and self.th_mgr.set_ctx_weight(file_id, weight)):
+                    return {"ok": False, "error": "unknown_file_id"}
+                return {"ok": True, "file_id": file_id, "weight": weight}
+
+            #  Estadísticas del receptor (ACK diferido)
+            if t == "file_rx_stats":
+                if not self.file_receiver:
+                    return {"ok": False, "error": "receiver_not_ready"}
+                return {"ok": True, **self.file_receiver.stats()}
+
+            if t == "queue_stats":
+                if not self.th_mgr:
+                    return {"ok": False, "error": "threads_not_ready"}
+                return {"ok": True, "queues": self.th_mgr.queue_stats()}
+
+            if t == "path_mtu":
+                # {"type":"path_mtu","mac":"aa:bb:..."} mide (o usa el cache); sin mac lista el cache
+                if not self.th_mgr:
+                    return {"ok": False, "error": "threads_not_ready"}
+                mac = cmd.get("mac")
+                prober = self.th_mgr.path_mtu
+                if mac:
+                    loop = asyncio.get_running_loop()
+                    mtu = await loop.run_in_executor(None, prober.path_mtu, mac)
+                    return {"ok": True, "mac": mac, "mtu": mtu, "local_mtu": prober.local_mtu}
+                return {"ok": True, "local_mtu": prober.local_mtu, "peers": prober.snapshot()}
+
+            if t == "peer_ping":
+                # {"type":"peer_ping","mac":"aa:bb:...","count":5,"interval_ms":200,"size":64}
+                if not self.th_mgr:
+                    return {"ok": False, "error": "threads_not_ready"}
+                mac = cmd.get("mac") or cmd.get("dst")
+                try:
+                    count = min(1000, max(1, int(cmd.get("count", 5))))
+                    interval_s = max(0.001, float(cmd.get("interval_ms", 200)) / 1000)
+                    size = max(0, int(cmd.get("size", 64)))
+                except (TypeError, ValueError):
+                    mac = None
+                if not mac:
+                    return {"ok": False, "error": "missing mac/count/interval_ms/size"}
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    None, lambda: self.th_mgr.pinger.run(mac, count=count, interval_s=interval_s, size=size)
+                )
+                return {"ok": True, **result}
+
+            if t == "link_stats":
+                # {"type":"link_stats"} o {"type":"link_stats","mac":"aa:bb:..."}
+                if not self.th_mgr:
+                    return {"ok": False, "error": "threads_not_ready"}
+                peers = self.th_mgr.link_stats.snapshot()
+                mac = cmd.get("mac")
+                if mac:
+                    return {"ok": True, "mac": mac, "stats": peers.get(mac)}
+                return {"ok": True, "peers": peers}
+
+            if t == "security_suites":
+                # {"type":"security_suites"} o {"type":"security_suites","mac":"aa:bb:..."}
+                if not self.security:
+                    return {"ok": False, "error": "security_disabled"}
+                stats = self.security.crypto_stats()
+                mac = cmd.get("mac")
+                if mac:
+                    return {"ok": True, "mac": mac, "stats": stats["peers"].get(mac)}
+                return {"ok": True, **stats}
+
+            if t == "pacing_stats":
+                if not self.th_mgr:
+                    return {"ok": False, "error": "threads_not_ready"}
+                return {"ok": True, "peers": self.th_mgr.pacing_stats()}
+
+            if t == "pacing_set":
+                if not self.th_mgr:
+                    return {"ok": False, "error": "threads_not_ready"}
+                mac = cmd.get("mac")
+                try:
+                    rate = float(cmd.get("rate"))
+                except (TypeError, ValueError):
+                    rate = None
+                if not mac or rate is None:
+                    return {"ok": False, "error": "missing mac/rate"}
+                self.th_mgr.pacer.set_rate(mac, rate)
+                return {"ok": True, "mac": mac, "rate": rate}
+
+            #  Jobs 
+            if t == "job_status":
+                job_id = cmd.get("job_id")
+                if not job_id:
+                    return {"ok": True, "jobs": [j.snapshot() for j in self.jobs.jobs()]}
+                job = self.jobs.get(job_id)
+                if not job:
+                    return {"ok": False, "error": "unknown_job"}
+                return {"ok": True, "job": job.snapshot()}
+
+            if t == "job_cancel":
+                job_id = cmd.get("job_id")
+                job = self.jobs.get(job_id) if job_id else None
+                if not job:
+                    return {"ok": False, "error": "unknown_job"}
+                canceled = self.jobs.cancel(job_id)
+                # Las transferencias ya lanzadas por el job también se abortan
+                for file_id in list(job.file_ids):
+                    if self.file_sender and self.file_sender.cancel_file(file_id):
+                        canceled = True
+                return {"ok": True, "canceled": canceled, "job": job.snapshot()}
 
             return {"ok": False, "error": f"unknown_command:{t}"}
         except Exception as e:
             logging.exception("Error en _on_cmd")
             return {"ok": False, "error": str(e)}
 
+    def _ensure_file_sender(self):
+        # CHUNK_SIZE solo es el respaldo: con MTU discovery el chunk se negocia por peer
+        if not self.file_sender:
+            chunk_size = int(os.environ.get("CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+            self.file_sender = FileSender(self.th_mgr, chunk_size)
+
+    #  Jobs (corren en el pool de JobManager, nunca en el loop del IPC)
+    def _job_file_send(self, job: Job) -> Dict[str, Any]:
+        # Igual que folder_send: el job termina con la transferencia, no al encolar el META
+        dst, path = job.params["dst"], job.params["path"]
+
+        def on_file_started(file_id: str):
+            job.file_ids.append(file_id)
+            self._track_file_out(file_id, dst, path, os.path.basename(path))
+
+        ctx = self.file_sender.send_file_and_wait(
+            path=path, dst_mac=dst, cancel_event=job.cancel_event,
+            on_file_started=on_file_started, weight=job.params["weight"],
+            ack_every=job.params["ack_every"], ack_delay_ms=job.params["ack_delay_ms"],
+        )
+        if ctx.state is FileTxState.FAILED and not job.cancel_event.is_set():
+            raise RuntimeError(ctx.error or "failed")
+        return {"file_id": ctx.file_id, "state": ctx.state.value}
+
+    def _job_folder_send(self, job: Job) -> Dict[str, Any]:
+        dst, folder = job.params["dst"], job.params["folder"]
+
+        def on_file_started(file_id: str, rel: str):
+            job.file_ids.append(file_id)
+            path_abs = os.path.join(folder, rel)
+            name = os.path.basename(rel) or os.path.basename(path_abs)
+            self._track_file_out(file_id, dst, path_abs, name, rel=rel)
+
+        sent_list = self.file_sender.send_folder(
+            folder_path=folder,
+            dst_mac=dst,
+            cancel_event=job.cancel_event,
+            on_file_started=on_file_started,
+            weight=job.params["weight"],
+            ack_every=job.params["ack_every"],
+            ack_delay_ms=job.params["ack_delay_ms"],
+        )
+        return {"files": [{"file_id": file_id, "rel": rel} for file_id, rel in sent_list]}
+
+    def _track_file_out(self, file_id: str, dst: str, path: str, name: str, rel: Optional[str] = None):
+        meta = {"dst": dst, "path": path, "name": name, "t0": time.time()}
+        if rel:
+            meta["rel"] = rel
+        self._files_out[file_id] = meta
+
+        # Evento TX start (con rel si viene de una carpeta)
+        ev = {"type": "file_tx_started", "file_id": file_id, "dst": dst, "name": name}
+        if rel:
+            ev["rel"] = rel
+        self._emit_event(ev)
+        self._ensure_file_poller()
+
+    def _on_job_finished(self, job: Job):
+        self._emit_event({"type": "job_finished", **job.snapshot()})
+
     def _start_ipc(self):
         if not self.ipc_enable:
             logging.info("IPC deshabilitado o no disponible.")
@@ -270,8 +443,8 @@ class AppServer:
         logging.info(f"[IPC] UDS escuchando en {self.socket_path}")
 
     #  Backend → UI (eventos) 
-    def _on_neighbors_changed(self, _rows_dict):
-        self._emit_event(_neighbors_snapshot(self.discovery.neighbors))
+    def _on_neighbors_diff(self, diff: Dict[str, Any]):
+        self._emit_event({"type": "neighbors_diff", **diff})
 
     def _on_app_message(self, frame, src_mac: str, payload: bytes):
         try:
@@ -336,6 +509,60 @@ class AppServer:
             on_error=on_error,
         )
 
+    def _register_file_tx_callbacks(self):
+        """
+        Publica la máquina de estados de envío (meta_pending/sending/finished/failed)
+        como file_tx_state, y el cierre como file_tx_finished / file_tx_error.
+        """
+        def on_state(ev: Dict[str, Any]):
+            file_id = ev.get("file_id")
+            self._emit_event({
+                "type": "file_tx_state",
+                "file_id": file_id,
+                "dst": ev.get("dst"),
+                "name": ev.get("name"),
+                "rel": ev.get("rel"),
+                "state": ev.get("state"),
+                "reason": ev.get("reason") or None,
+            })
+            if ev.get("state") == FileTxState.FINISHED.value:
+                # Estado final de progreso siempre, aunque el poller no lo haya visto
+                ctx = self.th_mgr.get_ctx_by_id(file_id) if self.th_mgr else None
+                total = int(ctx.total_chunks) if ctx else 0
+                self._tx_progress.forget(file_id)
+                self._emit_event({
+                    "type": "file_tx_progress",
+                    "file_id": file_id,
+                    "dst": ev.get("dst"),
+                    "name": ev.get("name"),
+                    "rel": ev.get("rel"),
+                    "acked": total,
+                    "total": total,
+                    "progress": 1.0,
+                })
+                self._emit_event({
+                    "type": "file_tx_finished",
+                    "file_id": file_id,
+                    "dst": ev.get("dst"),
+                    "name": ev.get("name"),
+                    "rel": ev.get("rel"),
+                    "status": "ok",
+                })
+                self._files_out.pop(file_id, None)
+            elif ev.get("state") == FileTxState.FAILED.value:
+                self._tx_progress.forget(file_id)
+                self._emit_event({
+                    "type": "file_tx_error",
+                    "file_id": file_id,
+                    "dst": ev.get("dst"),
+                    "name": ev.get("name"),
+                    "rel": ev.get("rel"),
+                    "error": ev.get("reason") or "error",
+                })
+                self._files_out.pop(file_id, None)
+
+        set_tx_sinks(on_state=on_state)
+
     def _ensure_file_poller(self):
         if self._file_poll_thread and self._file_poll_thread.is_alive():
             return
@@ -348,9 +575,16 @@ class AppServer:
                 for file_id, meta in list(self._files_out.items()):
                     ctx = self.th_mgr.get_ctx_by_id(file_id) if self.th_mgr else None
                     if not ctx:
+                        # el pump ya lo retiró; el cierre llegó por file_tx_state
+                        self._files_out.pop(file_id, None)
+                        continue
+                    if ctx.finished:
+                        # el cierre (y el progreso final) lo publica file_tx_state
                         continue
                     acked = int(ctx.last_acked) + 1
                     total = int(ctx.total_chunks)
+                    if not self._tx_progress.should_emit(file_id, acked, total):
+                        continue
                     prog = (acked / total) if total else 0.0
                     self._emit_event({
                         "type": "file_tx_progress",
@@ -362,16 +596,6 @@ class AppServer:
                         "total": total,
                         "progress": prog,
                     })
-                    if getattr(ctx, "finished", False):
-                        self._emit_event({
-                            "type": "file_tx_finished",
-                            "file_id": file_id,
-                            "dst": meta["dst"],
-                            "name": meta["name"],
-                            "rel": meta.get("rel"),
-                            "status": "ok",
-                        })
-                        self._files_out.pop(file_id, None)
             except Exception:
                 logging.exception("file_progress_poller error")
             finally:
@@ -435,17 +659,23 @@ class AppServer:
                 os.makedirs(DEFAULT_BASE_DIR, exist_ok=True)
                 self.file_receiver = FileReceiver(self.th_mgr, DEFAULT_BASE_DIR)
                 self._register_file_rx_callbacks()
+                self._register_file_tx_callbacks()
 
                 # Discovery + Messaging
-                self.discovery = Discovery(service_threads=self.th_mgr, alias=self.alias, interval_seconds=5.0)
+                self.discovery = Discovery(
+                    service_threads=self.th_mgr, alias=self.alias, interval_seconds=5.0,
+                    suspect_after=float(os.environ.get("NEIGHBOR_SUSPECT_S", "15")),
+                    expire_after=float(os.environ.get("NEIGHBOR_EXPIRE_S", "60")),
+                )
                 self.discovery.attach()
 
-                self.messaging = Messaging(threads=self.th_mgr, neighbors_ref=self.discovery.neighbors, alias=self.alias)
+                self.messaging = Messaging(threads=self.th_mgr, neighbors_ref=self.discovery.neighbors, alias=self.alias,
+                                           active_peers=lambda: self.discovery.active_peers(include_suspect=True))
                 self.messaging.attach()
 
                 # hooks backend → IPC/UI
                 with contextlib.suppress(Exception):
-                    self.discovery.set_on_neighbors_changed(self._on_neighbors_changed)
+                    self.discovery.set_on_neighbors_diff(self._on_neighbors_diff)
                 self.messaging.on_message(self._on_app_message)
 
                 # IPC
@@ -469,6 +699,8 @@ class AppServer:
             logging.exception("Error inesperado en AppServer")
             sys.exit(1)
         finally:
+            with contextlib.suppress(Exception):
+                self.jobs.shutdown()
             with contextlib.suppress(Exception):
                 if self.th_mgr:
                     self.th_mgr.stop()
@@ -7,7 +7,27 @@ class MessageType(Enum):
     ACK = auto()     # Message type for confirmation
     FILE_META = auto()
     FILE_DATA = auto()   
-    FILE_FIN = auto() 
+    FILE_FIN = auto()
+    BUNDLE = auto()      # varios frames chicos (ACK, chat, replies) en uno solo
+    MTU_PROBE = auto()   # frame con relleno hasta el tamaño a probar
+    MTU_REPLY = auto()
+    PING = auto()        # sondeo de RTT de capa 2 (seq + timestamp)
+    PONG = auto()
+    SEC_HELLO = auto()   # handshake de sesión (claves por peer y dirección)
 
 
+class FileTxState(Enum):
+    """Estados de una transferencia saliente (máquina de estados del FileSender)."""
+    META_PENDING = "meta_pending"   # META enviado, esperando ACK next_needed=0
+    SENDING = "sending"             # META confirmado, ventana de DATA activa
+    FINISHED = "finished"           # todos los chunks confirmados, FIN ok enviado
+    FAILED = "failed"               # timeout de META/DATA o FIN de error del receptor
 
+
+class JobStatus(Enum):
+    """Estados de un comando IPC ejecutado en segundo plano (JobManager)."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    ERROR = "error"
+    CANCELED = "canceled"
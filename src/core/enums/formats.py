@@ -23,6 +23,18 @@ class HeaderFormat:
 
 
 
+class BundleItemFormat:
+    @staticmethod
+    def get_format() -> str:
+        # message_type (H), sequence (I), payload_len (H) de cada frame dentro de un BUNDLE
+        return "!HIH"
+
+    @staticmethod
+    def get_len() -> int:
+        return struct.calcsize(BundleItemFormat.get_format())
+
+
+
 class EtherHeaderFormat(Enum):
     """
     Formato de la cabecera Ethernet: !6s6sH
@@ -0,0 +1,147 @@
+from typing import Iterator, Tuple
+
+_SCAN_STEP = 4096          # bytes por tramo al buscar el primer hueco
+_FULL_STEP = b"\xff" * _SCAN_STEP
+
+
+class ChunkBitset:
+    """
+    Conjunto compacto de índices de chunk [0, size): un bit por chunk en un bytearray
+    más un contador de bits en 1. Un archivo de 10 GB en chunks de 1200 B ocupa ~1.1 MB.
+
+    Bit i -> byte i >> 3, máscara 1 << (i & 7). Soporta `in`, len(), add(),
+    set_range(), first_missing() y recorridos por huecos o por rangos (SACK, sidecars).
+    """
+    __slots__ = ("size", "_bits", "_count")
+
+    def __init__(self, size: int):
+        if size < 0:
+            raise ValueError("size debe ser >= 0")
+        self.size = size
+        self._bits = bytearray((size + 7) >> 3)
+        self._count = 0
+
+    #  consulta
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, idx: int) -> bool:
+        return 0 <= idx < self.size and bool(self._bits[idx >> 3] & (1 << (idx & 7)))
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.size
+
+    def first_missing(self, start: int = 0) -> int:
+        """Primer índice >= start que no está en el conjunto (size si no hay)."""
+        if start >= self.size:
+            return self.size
+        bits = self._bits
+        i = start >> 3
+        # Byte parcial del inicio
+        b = bits[i] >> (start & 7)
+        if b != (0xFF >> (start & 7)):
+            idx = start
+            while b & 1:
+                b >>= 1
+                idx += 1
+            return min(idx, self.size)
+        i += 1
+        # Bytes completos: se saltan tramos llenos sin recorrerlos en Python
+        n = len(bits)
+        while i < n:
+            chunk = bits[i:i + _SCAN_STEP]
+            if chunk == _FULL_STEP[:len(chunk)]:
+                i += len(chunk)
+                continue
+            i += len(chunk) - len(chunk.lstrip(b"\xff"))
+            b, idx = bits[i], i << 3
+            while b & 1:
+                b >>= 1
+                idx += 1
+            return min(idx, self.size)
+        return self.size
+
+    def iter_missing(self, start: int = 0, stop: int | None = None) -> Iterator[int]:
+        """Índices ausentes en [start, stop)."""
+        stop = self.size if stop is None else min(stop, self.size)
+        idx = self.first_missing(start)
+        while idx < stop:
+            yield idx
+            idx += 1
+            if idx < stop and idx in self:
+                idx = self.first_missing(idx)
+
+    def iter_ranges(self) -> Iterator[Tuple[int, int]]:
+        """Rangos [inicio, fin) de índices presentes, en orden (útil para SACK)."""
+        bits, idx, size = self._bits, 0, self.size
+        run_start = -1
+        for i, b in enumerate(bits):
+            if b == 0xFF and run_start >= 0:
+                continue
+            if b == 0 and run_start < 0:
+                continue
+            base = i << 3
+            for bit in range(8):
+                idx = base + bit
+                if idx >= size:
+                    break
+                if b & (1 << bit):
+                    if run_start < 0:
+                        run_start = idx
+                elif run_start >= 0:
+                    yield run_start, idx
+                    run_start = -1
+        if run_start >= 0:
+            yield run_start, size
+
+    #  modificación
+    def add(self, idx: int) -> bool:
+        """Marca idx; devuelve True si no estaba."""
+        if not 0 <= idx < self.size:
+            raise IndexError(idx)
+        mask = 1 << (idx & 7)
+        byte = self._bits[idx >> 3]
+        if byte & mask:
+            return False
+        self._bits[idx >> 3] = byte | mask
+        self._count += 1
+        return True
+
+    def set_range(self, start: int, stop: int) -> int:
+        """Marca [start, stop); devuelve cuántos índices eran nuevos."""
+        start, stop = max(0, start), min(stop, self.size)
+        added = 0
+        # Bits sueltos hasta alinear a byte
+        while start < stop and start & 7:
+            added += self.add(start)
+            start += 1
+        # Bytes completos de una vez
+        first, last = start >> 3, stop >> 3
+        if last > first:
+            before = int.from_bytes(self._bits[first:last], "little").bit_count()
+            self._bits[first:last] = b"\xff" * (last - first)
+            added += ((last - first) << 3) - before
+            self._count += ((last - first) << 3) - before
+            start = last << 3
+        while start < stop:
+            added += self.add(start)
+            start += 1
+        return added
+
+    #  serialización (sidecars de reanudación)
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, size: int, data: bytes) -> "ChunkBitset":
+        bs = cls(size)
+        nbytes = len(bs._bits)
+        bs._bits[:] = data[:nbytes].ljust(nbytes, b"\x00")
+        if size & 7 and nbytes:
+            bs._bits[-1] &= (1 << (size & 7)) - 1   # sin bits fuera de rango
+        bs._count = int.from_bytes(bs._bits, "little").bit_count()
+        return bs
+
+    def __repr__(self) -> str:
+        return f"ChunkBitset(size={self.size}, count={self._count})"
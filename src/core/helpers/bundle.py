@@ -0,0 +1,124 @@
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from src.core.enums.enums import MessageType
+from src.core.enums.formats import BundleItemFormat
+from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema
+
+
+def pack_bundle(frames: List[FrameSchema]) -> FrameSchema:
+    """
+    Empaqueta frames del mismo destino en un solo FrameSchema BUNDLE.
+    Payload: por cada frame [type(H) sequence(I) len(H)] + payload, uno detrás de otro.
+    """
+    fmt = BundleItemFormat.get_format()
+    parts = []
+    for f in frames:
+        parts.append(struct.pack(fmt, f.header.message_type.value, f.header.sequence, len(f.payload)))
+        parts.append(f.payload)
+    payload = b"".join(parts)
+    first = frames[0]
+    return FrameSchema(
+        dst_mac=first.dst_mac,
+        src_mac=first.src_mac,
+        ethertype=first.ethertype,
+        header=HeaderSchema(
+            message_type=MessageType.BUNDLE,
+            sequence=first.header.sequence,
+            payload_len=len(payload),
+        ),
+        payload=payload,
+    )
+
+
+def unpack_bundle(frame: FrameSchema) -> List[FrameSchema]:
+    """Separa un BUNDLE en sus frames; lanza ValueError si el payload está truncado."""
+    fmt, item_len = BundleItemFormat.get_format(), BundleItemFormat.get_len()
+    data, pos, out = frame.payload, 0, []
+    while pos < len(data):
+        if pos + item_len > len(data):
+            raise ValueError("BUNDLE truncado (cabecera)")
+        type_val, sequence, length = struct.unpack_from(fmt, data, pos)
+        pos += item_len
+        if pos + length > len(data):
+            raise ValueError("BUNDLE truncado (payload)")
+        message_type = MessageType(type_val)
+        if message_type is MessageType.BUNDLE:
+            raise ValueError("BUNDLE anidado")
+        out.append(FrameSchema(
+            dst_mac=frame.dst_mac,
+            src_mac=frame.src_mac,
+            ethertype=frame.ethertype,
+            header=HeaderSchema(message_type=message_type, sequence=sequence, payload_len=length),
+            payload=data[pos:pos + length],
+        ))
+        pos += length
+    return out
+
+
+class Bundler:
+    """
+    Agrupa frames chicos de control por destino durante `window_s` (o hasta max_bytes)
+    y los entrega empaquetados en un BUNDLE. Lo usa solo el hilo sender: sin locks.
+    """
+    # Solo tipos que el sobre de seguridad protege igual que al BUNDLE: discovery y SEC_HELLO
+    # viajan en claro (hay que poder descubrir un peer antes de tener sesión), no se agrupan
+    TYPES = frozenset({MessageType.ACK, MessageType.APP_MESSAGE})
+
+    def __init__(self, window_s: float = 0.002, max_bytes: int = 1400, item_max: int = 256):
+        self.window_s = window_s
+        self.max_bytes = max_bytes
+        self.item_max = item_max
+        self._pending: Dict[str, List[FrameSchema]] = {}
+        self._size: Dict[str, int] = {}
+        self._deadline: Dict[str, float] = {}
+        self.bundles_sent = 0
+        self.frames_bundled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_s > 0
+
+    def offer(self, frame: FrameSchema, now: float) -> Optional[List[FrameSchema]]:
+        """
+        None si el frame no se agrupa (enviarlo normal). Si se agrupa, devuelve lo que
+        haya que enviar ya (un BUNDLE lleno que se cerró para hacerle lugar, o nada).
+        """
+        if (not self.enabled or frame.header.message_type not in self.TYPES
+                or len(frame.payload) > self.item_max):
+            return None
+        dst = frame.dst_mac
+        item = BundleItemFormat.get_len() + len(frame.payload)
+        ready = []
+        if dst in self._pending and self._size[dst] + item > self.max_bytes:
+            ready = self.take(dst)
+        if dst not in self._pending:
+            self._pending[dst], self._size[dst] = [], 0
+            self._deadline[dst] = now + self.window_s
+        self._pending[dst].append(frame)
+        self._size[dst] += item
+        return ready
+
+    def take(self, dst: str) -> List[FrameSchema]:
+        """Cierra el grupo de `dst`: un solo frame sale tal cual, dos o más en un BUNDLE."""
+        frames = self._pending.pop(dst, None)
+        self._size.pop(dst, None)
+        self._deadline.pop(dst, None)
+        if not frames:
+            return []
+        if len(frames) == 1:
+            return frames
+        self.bundles_sent += 1
+        self.frames_bundled += len(frames)
+        return [pack_bundle(frames)]
+
+    def due(self, now: float) -> Tuple[List[FrameSchema], float]:
+        """Grupos vencidos listos para enviar y segundos hasta el próximo vencimiento."""
+        ready: List[FrameSchema] = []
+        next_wait = 1.0
+        for dst, deadline in list(self._deadline.items()):
+            if deadline <= now:
+                ready.extend(self.take(dst))
+            else:
+                next_wait = min(next_wait, deadline - now)
+        return ready, next_wait
@@ -15,11 +15,16 @@ def _pack_header_with_checksum(header: HeaderSchema, checksum: int) -> bytes:
     return struct.pack(fmt_w, header.message_type.value, header.sequence, header.payload_len, checksum)
 
 
-def create_ethernet_frame(frame_data: FrameSchema) -> bytes:
-    
-    header_wo = _pack_header_without_checksum(frame_data.header)
-
-    checksum = zlib.crc32(header_wo + frame_data.payload) & 0xFFFFFFFF
+def create_ethernet_frame(frame_data: FrameSchema, with_crc: bool = True) -> bytes:
+    """
+    with_crc=False deja el checksum en 0: para frames cuya integridad ya cubre el tag
+    de seguridad (ver decode_ethernet_frame(skip_crc_types=...)).
+    """
+    if with_crc:
+        header_wo = _pack_header_without_checksum(frame_data.header)
+        checksum = zlib.crc32(header_wo + frame_data.payload) & 0xFFFFFFFF
+    else:
+        checksum = 0
 
     header_w = _pack_header_with_checksum(frame_data.header, checksum)
 
@@ -6,8 +6,11 @@ from src.core.enums.formats import EtherHeaderFormat, HeaderFormat
 from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema
 
 
-def decode_ethernet_frame(frame: bytes) -> FrameSchema:
-   
+def decode_ethernet_frame(frame: bytes, skip_crc_types: frozenset = frozenset()) -> FrameSchema:
+    """
+    skip_crc_types: tipos que no se verifican por CRC porque los autentica la capa de
+    seguridad (el HMAC ya detecta cualquier corrupción); vacío si no hay seguridad.
+    """
     eth_header_len = EtherHeaderFormat.get_len()
     dst_mac_bytes, src_mac_bytes, ethertype = struct.unpack(
         EtherHeaderFormat.get_format(), frame[:eth_header_len]
@@ -31,20 +34,23 @@ def decode_ethernet_frame(frame: bytes) -> FrameSchema:
     payload_end = payload_start + payload_len
     payload = frame[payload_start:payload_end]
 
+    message_type = MessageType(msg_type_val)
+
     # ---  Recalcular CRC-32 sobre (header_sin_checksum + payload) ---
-    hdr_fmt_wo = HeaderFormat.get_format_without_checksum()
-    header_wo = struct.pack(hdr_fmt_wo, msg_type_val, sequence, payload_len)
-    checksum_calc = zlib.crc32(header_wo + payload) & 0xFFFFFFFF
+    if message_type not in skip_crc_types:
+        hdr_fmt_wo = HeaderFormat.get_format_without_checksum()
+        header_wo = struct.pack(hdr_fmt_wo, msg_type_val, sequence, payload_len)
+        checksum_calc = zlib.crc32(header_wo + payload) & 0xFFFFFFFF
 
-    if checksum_calc != checksum_rx:
-    #   lanzar excepción y que el receiver la capture y descarte
-        raise ValueError(
-            f"CRC inválido: esperado=0x{checksum_rx:08x}, calculado=0x{checksum_calc:08x}"
-        )
+        if checksum_calc != checksum_rx:
+        #   lanzar excepción y que el receiver la capture y descarte
+            raise ValueError(
+                f"CRC inválido: esperado=0x{checksum_rx:08x}, calculado=0x{checksum_calc:08x}"
+            )
 
     # --- Construir schemas (incluye checksum en el header) ---
     header_obj = HeaderSchema(
-        message_type=MessageType(msg_type_val),
+        message_type=message_type,
         sequence=sequence,
         payload_len=payload_len,
         checksum=checksum_rx,
@@ -0,0 +1,174 @@
+import logging
+import queue
+import threading
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional
+
+from src.core.enums.enums import MessageType
+from src.core.schemas.frame_schemas import FrameSchema
+
+
+class FrameQueue:
+    """
+    Cola FIFO de frames acotada, con descarte según MessageType cuando se llena.
+    Misma interfaz que queue.Queue para el uso de ThreadManager (put/get/qsize/task_done).
+
+    Política:
+      - Con presión (>= pressure * maxsize) se descartan primero los duplicados:
+        un FILE_DATA con el mismo (file_id, idx) ya encolado, o un DISCOVER_REQUEST
+        de un origen que ya tiene uno esperando.
+      - Llena: se descarta el frame nuevo si es descartable (DISCOVER_*, FILE_DATA).
+        APP_MESSAGE y FILE_META desplazan al DISCOVER/FILE_DATA más viejo de la cola.
+      - ACK y FILE_FIN nunca se descartan: se admiten por encima de maxsize hasta
+        hard_max (2 x maxsize), el único tope que protege la memoria ante un ataque.
+    """
+    NEVER_DROP = frozenset({MessageType.ACK, MessageType.FILE_FIN})
+    # Orden de sacrificio (menor = se descarta antes)
+    SHED_RANK: Dict[MessageType, int] = {
+        MessageType.DISCOVER_REQUEST: 0,
+        MessageType.DISCOVER_REPLY: 0,
+        MessageType.MTU_PROBE: 0,
+        MessageType.MTU_REPLY: 0,
+        MessageType.PING: 0,
+        MessageType.PONG: 0,
+        MessageType.FILE_DATA: 1,
+        MessageType.APP_MESSAGE: 2,
+        MessageType.FILE_META: 2,
+        MessageType.SEC_HELLO: 2,
+    }
+
+    def __init__(self, name: str, maxsize: int = 4096, pressure: float = 0.75,
+                 priority: frozenset = frozenset()):
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.hard_max = 2 * self.maxsize
+        self._pressure_at = max(1, int(self.maxsize * pressure))
+        self._items: Deque[FrameSchema] = deque()
+        # Tipos en `priority` salen antes que el resto (FIFO entre ellos), con su propio
+        # cupo de maxsize aparte del de la cola principal
+        self.priority = priority
+        self._priority_items: Deque[FrameSchema] = deque()
+        self._cond = threading.Condition()
+        # claves de duplicados encolados -> cuántos hay
+        self._dup_keys: Dict[Hashable, int] = {}
+
+        self.high_water = 0
+        self.drops: Dict[str, int] = {}
+        self.over_limit = 0    # ACK/FIN admitidos por encima de maxsize
+
+    #  API tipo queue.Queue
+    def put(self, frame: FrameSchema) -> bool:
+        """Encola; devuelve False si el frame fue descartado por la política."""
+        mtype = frame.header.message_type
+        with self._cond:
+            if mtype in self.priority:
+                if len(self._priority_items) >= self.maxsize:
+                    return self._drop(mtype, "full")
+                self._priority_items.append(frame)
+                self._cond.notify()
+                return True
+
+            size = len(self._items)
+            key = self._dup_key(frame)
+
+            if size >= self._pressure_at and key is not None and key in self._dup_keys:
+                return self._drop(mtype, "dup")
+
+            if size >= self.maxsize:
+                if mtype in self.NEVER_DROP:
+                    if size >= self.hard_max:
+                        return self._drop(mtype, "hard_max")
+                    self.over_limit += 1
+                elif not self._evict_lower(self.SHED_RANK.get(mtype, 1)):
+                    return self._drop(mtype, "full")
+
+            self._items.append(frame)
+            if key is not None:
+                self._dup_keys[key] = self._dup_keys.get(key, 0) + 1
+            self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> FrameSchema:
+        with self._cond:
+            if not self.qsize() and not self._cond.wait_for(self.qsize, timeout=timeout):
+                raise queue.Empty
+            return self._pop_left()
+
+    def get_nowait(self) -> FrameSchema:
+        with self._cond:
+            if not self.qsize():
+                raise queue.Empty
+            return self._pop_left()
+
+    def qsize(self) -> int:
+        return len(self._items) + len(self._priority_items)
+
+    def task_done(self):
+        # Compatibilidad con queue.Queue (no se usa join())
+        pass
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "size": self.qsize(),
+            "maxsize": self.maxsize,
+            "high_water": self.high_water,
+            "over_limit": self.over_limit,
+            "drops": dict(self.drops),
+        }
+
+    #  internos
+    def _pop_left(self) -> FrameSchema:
+        if self._priority_items:
+            return self._priority_items.popleft()
+        frame = self._items.popleft()
+        self._forget_key(frame)
+        return frame
+
+    def _evict_lower(self, rank: int) -> bool:
+        """Saca un frame encolado con rango de sacrificio menor que `rank`."""
+        if rank < 2:
+            # DISCOVER/FILE_DATA no desplazan a nadie: se descarta el nuevo (tail drop)
+            return False
+        # Preferencia: el de menor rango (discovery antes que datos), y entre iguales el más viejo
+        victim, victim_rank = -1, rank
+        for i, old in enumerate(self._items):
+            old_type = old.header.message_type
+            old_rank = self.SHED_RANK.get(old_type, 1)
+            if old_type not in self.NEVER_DROP and old_rank < victim_rank:
+                victim, victim_rank = i, old_rank
+                if old_rank == 0:
+                    break
+        if victim < 0:
+            return False
+        old = self._items[victim]
+        del self._items[victim]
+        self._forget_key(old)
+        self._drop(old.header.message_type, "evicted")
+        return True
+
+    def _drop(self, mtype: MessageType, reason: str) -> bool:
+        self.drops[mtype.name] = self.drops.get(mtype.name, 0) + 1
+        logging.debug("[Queue %s] drop %s (%s) size=%d", self.name, mtype.name, reason, len(self._items))
+        return False
+
+    def _forget_key(self, frame: FrameSchema):
+        key = self._dup_key(frame)
+        if key is None:
+            return
+        left = self._dup_keys.get(key, 1) - 1
+        if left > 0:
+            self._dup_keys[key] = left
+        else:
+            self._dup_keys.pop(key, None)
+
+    @staticmethod
+    def _dup_key(frame: FrameSchema) -> Optional[Hashable]:
+        mtype = frame.header.message_type
+        if mtype is MessageType.FILE_DATA:
+            # Cabecera "file_id=..\nidx=..\ntotal=..\n\n" identifica el chunk
+            end = frame.payload.find(b"\n\n")
+            return (mtype, frame.dst_mac, frame.payload[:end]) if end != -1 else None
+        if mtype is MessageType.DISCOVER_REQUEST:
+            return (mtype, frame.src_mac)
+        return None
@@ -0,0 +1,81 @@
+import logging
+import queue
+import threading
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+# on_done(resultado, excepción): se invoca en el hilo de I/O al terminar la tarea
+DoneCallback = Callable[[Any, Optional[BaseException]], None]
+
+
+class IOWorkerPool:
+    """
+    Pool de hilos para I/O de disco (escrituras de chunks, hash final).
+    Cada tarea lleva una `key` (p.ej. file_id): todas las tareas de una misma key van
+    a la misma cola y se ejecutan en orden, en un solo hilo. Así el dispatcher solo
+    encola y vuelve, y un fsync o un hash lento no frena mensajes ni discovery.
+    """
+    def __init__(self, workers: int = 2, name: str = "io"):
+        self._name = name
+        self._queues: list[queue.Queue] = [queue.Queue() for _ in range(max(1, workers))]
+        self._threads: list[threading.Thread] = []
+        self._pending: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._shutdown_event = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        for i, q in enumerate(self._queues):
+            t = threading.Thread(target=self._worker_loop, args=(q,), name=f"{self._name}-{i}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def stop(self):
+        self._shutdown_event.set()
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def submit(self, key: str, fn: Callable[..., Any], *args, on_done: Optional[DoneCallback] = None):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self._queues[self._shard(key)].put((key, fn, args, on_done))
+
+    def backlog(self, key: str) -> int:
+        """Tareas encoladas o en curso para `key`."""
+        return self._pending.get(key, 0)
+
+    def total_backlog(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def _shard(self, key: str) -> int:
+        # crc32 y no hash(): estable entre procesos y barato
+        return zlib.crc32(key.encode("utf-8")) % len(self._queues)
+
+    def _worker_loop(self, q: queue.Queue):
+        logging.info("[IO] Hilo %s iniciado.", threading.current_thread().name)
+        while not self._shutdown_event.is_set():
+            try:
+                key, fn, args, on_done = q.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            result, error = None, None
+            try:
+                result = fn(*args)
+            except Exception as e:
+                logging.error(f"[IO] Error en tarea {getattr(fn, '__name__', fn)} key={key}: {e}")
+                error = e
+            finally:
+                with self._lock:
+                    left = self._pending.get(key, 1) - 1
+                    if left > 0:
+                        self._pending[key] = left
+                    else:
+                        self._pending.pop(key, None)
+
+            if on_done:
+                try:
+                    on_done(result, error)
+                except Exception as e:
+                    logging.exception(f"[IO] Callback on_done lanzó una excepción: {e}")
@@ -0,0 +1,89 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.core.enums.enums import JobStatus
+from src.core.schemas.job import Job
+
+
+class JobManager:
+    """
+    Ejecuta comandos IPC pesados (hash, META, carpetas) en un pool de hilos para que
+    el loop asyncio del IPC nunca se bloquee.
+      - submit(): encola el trabajo y devuelve el Job de inmediato (job_id).
+      - cancel(): marca cancel_event; los trabajos lo consultan entre pasos.
+      - on_finished(job): se invoca al terminar (done/error/canceled).
+    """
+    def __init__(self, max_workers: int = 2, keep_finished: int = 256,
+                 on_finished: Optional[Callable[[Job], None]] = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipc-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._keep_finished = keep_finished
+        self.on_finished = on_finished
+
+    def submit(self, kind: str, fn: Callable[[Job], Any], **params) -> Job:
+        """fn(job) corre en el pool; su retorno queda en job.result."""
+        job = Job(job_id=f"job-{next(self._ids)}-{int(time.time() * 1000)}", kind=kind, params=params)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if not job or job.done:
+            return False
+        job.cancel_event.set()
+        # Si aún no arrancó, no llegará a correr
+        if job.future and job.future.cancel():
+            self._finish(job, JobStatus.CANCELED)
+        return True
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]):
+        if job.cancel_event.is_set():
+            self._finish(job, JobStatus.CANCELED)
+            return
+        job.status = JobStatus.RUNNING
+        job.started_ts = time.time()
+        try:
+            job.result = fn(job)
+            status = JobStatus.CANCELED if job.cancel_event.is_set() else JobStatus.DONE
+            self._finish(job, status)
+        except Exception as e:
+            logging.exception("[Jobs] Error en job %s (%s)", job.job_id, job.kind)
+            job.error = str(e)
+            self._finish(job, JobStatus.ERROR)
+
+    def _finish(self, job: Job, status: JobStatus):
+        if job.done:
+            return
+        job.status = status
+        job.finished_ts = time.time()
+        if self.on_finished:
+            try:
+                self.on_finished(job)
+            except Exception:
+                logging.exception("[Jobs] Callback on_finished lanzó una excepción")
+
+    def _prune(self):
+        # Conserva como mucho keep_finished jobs terminados (los más viejos se descartan)
+        finished = [j for j in self._jobs.values() if j.done]
+        for j in finished[:max(0, len(finished) - self._keep_finished)]:
+            self._jobs.pop(j.job_id, None)
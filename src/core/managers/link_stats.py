@@ -0,0 +1,143 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class LinkStats:
+    """Calidad estimada del enlace con un peer (EWMA)."""
+    mac: str
+    srtt_s: float = 0.0         # RTT suavizado (0 = sin muestras)
+    rttvar_s: float = 0.0
+    rtt_samples: int = 0
+    loss: float = 0.0           # fracción de envíos de DATA que terminaron retransmitidos
+    goodput_bps: float = 0.0    # bytes/s confirmados por ACK
+    sent: int = 0
+    retransmits: int = 0
+    crc_errors: int = 0
+    bytes_acked: int = 0
+    updated_ts: float = 0.0
+    # ventana de medición de goodput
+    _acc_bytes: int = 0
+    _acc_start: float = 0.0
+    _acc_last: float = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "srtt_ms": round(self.srtt_s * 1000, 2),
+            "rttvar_ms": round(self.rttvar_s * 1000, 2),
+            "rtt_samples": self.rtt_samples,
+            "loss": round(self.loss, 4),
+            "goodput_bps": round(self.goodput_bps),
+            "sent": self.sent,
+            "retransmits": self.retransmits,
+            "crc_errors": self.crc_errors,
+            "bytes_acked": self.bytes_acked,
+            "age_s": round(time.time() - self.updated_ts, 1) if self.updated_ts else None,
+        }
+
+
+class LinkStatsTable:
+    """
+    Tabla por MAC de RTT, pérdida y goodput, alimentada con lo que ya pasa por el sistema:
+    tiempos de ACK (FileSender), retransmisiones (ThreadManager._retransfer_expired),
+    frames con CRC inválido (receptor) y bytes confirmados. Las transferencias nuevas
+    la consultan para su ventana inicial y su tamaño de chunk.
+    """
+    def __init__(self, rtt_alpha: float = 0.125, rtt_beta: float = 0.25, loss_alpha: float = 0.02,
+                 goodput_alpha: float = 0.25, goodput_period_s: float = 0.5):
+        self.rtt_alpha = rtt_alpha
+        self.rtt_beta = rtt_beta
+        self.loss_alpha = loss_alpha
+        self.goodput_alpha = goodput_alpha
+        self.goodput_period_s = goodput_period_s
+        self._peers: Dict[str, LinkStats] = {}
+        self._lock = threading.Lock()
+
+    #  muestras
+    def on_rtt(self, mac: str, sample_s: float):
+        if sample_s <= 0:
+            return
+        with self._lock:
+            st = self._peer(mac)
+            if st.rtt_samples == 0:
+                st.srtt_s, st.rttvar_s = sample_s, sample_s / 2
+            else:
+                # RFC 6298
+                st.rttvar_s = (1 - self.rtt_beta) * st.rttvar_s + self.rtt_beta * abs(st.srtt_s - sample_s)
+                st.srtt_s = (1 - self.rtt_alpha) * st.srtt_s + self.rtt_alpha * sample_s
+            st.rtt_samples += 1
+
+    def on_sent(self, mac: str):
+        with self._lock:
+            st = self._peer(mac)
+            st.sent += 1
+            st.loss *= 1 - self.loss_alpha
+
+    def on_retransmit(self, mac: str):
+        with self._lock:
+            st = self._peer(mac)
+            st.retransmits += 1
+            st.loss = (1 - self.loss_alpha) * st.loss + self.loss_alpha
+
+    def on_crc_error(self, mac: str):
+        with self._lock:
+            self._peer(mac).crc_errors += 1
+
+    def on_acked(self, mac: str, nbytes: int, now: Optional[float] = None):
+        if nbytes <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self._peer(mac)
+            st.bytes_acked += nbytes
+            # Tras una pausa larga la ventana de medición arranca de nuevo (no promediar el ocio)
+            if not st._acc_start or now - st._acc_last > 2.0:
+                st._acc_start, st._acc_bytes = now, 0
+            st._acc_bytes += nbytes
+            st._acc_last = now
+            elapsed = now - st._acc_start
+            if elapsed >= self.goodput_period_s:
+                rate = st._acc_bytes / elapsed
+                st.goodput_bps = rate if not st.goodput_bps else \
+                    (1 - self.goodput_alpha) * st.goodput_bps + self.goodput_alpha * rate
+                st._acc_start, st._acc_bytes = now, 0
+
+    #  consultas
+    def get(self, mac: str) -> Optional[LinkStats]:
+        return self._peers.get(mac)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {mac: st.snapshot() for mac, st in self._peers.items()}
+
+    def initial_window(self, mac: str, chunk_size: int, default: int = 16, hi: int = 64) -> int:
+        """
+        Ventana inicial en chunks: el producto goodput x RTT (con margen de 2x) si hay
+        datos del enlace, nunca menos que `default` (con pérdida aleatoria el goodput
+        cae por los timeouts, no porque sobre ventana) ni más que `hi`.
+        """
+        st = self._peers.get(mac)
+        if not st or chunk_size <= 0 or st.goodput_bps <= 0 or st.srtt_s <= 0:
+            return default
+        bdp_chunks = math.ceil(2 * st.goodput_bps * st.srtt_s / chunk_size)
+        return min(hi, max(default, bdp_chunks))
+
+    def chunk_size(self, mac: str, chunk_size: int, lossy_cap: int = 1400) -> int:
+        """
+        Con pérdida alta no se usan chunks jumbo: un frame de 9000 B perdido cuesta seis
+        veces más que uno estándar. Por debajo de lossy_cap el tamaño no cambia.
+        """
+        st = self._peers.get(mac)
+        if st and st.loss >= 0.05:
+            return min(chunk_size, lossy_cap)
+        return chunk_size
+
+    def _peer(self, mac: str) -> LinkStats:
+        st = self._peers.get(mac)
+        if st is None:
+            st = self._peers[mac] = LinkStats(mac)
+        st.updated_ts = time.time()
+        return st
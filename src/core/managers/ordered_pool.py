@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List
+
+
+class _Slot:
+    __slots__ = ("item", "result", "done")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.result: Any = None
+        self.done = False
+
+
+class OrderedWorkerPool:
+    """
+    Aplica `fn` a items en paralelo (N hilos) y entrega los resultados a `emit` en el
+    mismo orden en que se enviaron *dentro de cada key*; keys distintas no se esperan
+    entre sí. Un solo hilo emisor llama a `emit`, así el consumidor no necesita locks.
+
+    Pensado para la etapa de cifrado: fn = proteger + armar frame, emit = socket.send;
+    o fn = decodificar + verificar, emit = ruteo al dispatcher. Los resultados None no
+    se emiten (frame descartado) pero sí liberan el orden.
+    """
+    def __init__(self, fn: Callable[[Any], Any], emit: Callable[[Any], None],
+                 workers: int = 2, name: str = "pool", max_pending: int = 256):
+        self._fn = fn
+        self._emit = emit
+        self._name = name
+        self._workers = max(1, workers)
+        self._work: "queue.Queue[_Slot]" = queue.Queue(maxsize=max_pending)
+        self._lanes: Dict[Hashable, Deque[_Slot]] = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self._workers):
+            self._threads.append(threading.Thread(target=self._worker_loop, name=f"{self._name}-{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._emit_loop, name=f"{self._name}-emit", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def submit(self, key: Hashable, item: Any):
+        """Encola; bloquea si hay max_pending items sin procesar (contrapresión)."""
+        slot = _Slot(item)
+        with self._cond:
+            self._lanes.setdefault(key, deque()).append(slot)
+        self._work.put(slot)
+
+    def backlog(self) -> int:
+        return sum(len(lane) for lane in list(self._lanes.values()))
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                slot = self._work.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                slot.result = self._fn(slot.item)
+            except Exception as e:
+                logging.error(f"[{self._name}] Error procesando item: {e}")
+                slot.result = None
+            with self._cond:
+                slot.done = True
+                self._cond.notify()
+
+    def _emit_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                out = self._collect_ready()
+                if not out:
+                    # Nada listo en la cabeza de ningún carril: esperar al próximo resultado
+                    self._cond.wait(0.5)
+                    continue
+            for result in out:
+                if result is None:
+                    continue
+                try:
+                    self._emit(result)
+                except Exception as e:
+                    logging.error(f"[{self._name}] Error emitiendo: {e}")
+
+    def _collect_ready(self) -> List[Any]:
+        """Resultados listos desde la cabeza de cada carril (con _cond tomado)."""
+        out = []
+        for key, lane in list(self._lanes.items()):
+            while lane and lane[0].done:
+                out.append(lane.popleft().result)
+            if not lane:
+                del self._lanes[key]
+        return out
@@ -0,0 +1,140 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Bytes por frame que no están en el payload (Ethernet + header + sobre de seguridad)
+FRAME_OVERHEAD = 64
+
+
+class TokenBucket:
+    """Cubeta de tokens en bytes: `rate` bytes/s, hasta `burst` bytes acumulados."""
+    __slots__ = ("rate", "burst", "tokens", "ts")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.ts:
+            self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+
+    def delay(self, nbytes: int, now: float) -> float:
+        """Segundos hasta poder enviar nbytes (0 = ya). rate <= 0 significa sin límite."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(nbytes, self.burst) - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def consume(self, nbytes: int, now: float):
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= nbytes   # puede quedar negativo: un frame grande "se endeuda"
+
+
+@dataclass
+class PeerPacing:
+    bucket: TokenBucket
+    source: str = "static"     # static | cc | manual
+    frames: int = 0
+    bytes: int = 0
+    delayed: int = 0           # frames que tuvieron que esperar tokens
+    wait_s: float = 0.0        # espera acumulada estimada
+
+
+class Pacer:
+    """
+    Pacing de FILE_DATA por MAC destino, con tope global opcional.
+    Cada destino tiene su TokenBucket; el tope global es otra cubeta compartida.
+    Las tasas salen de la configuración (rate/global_rate, en bytes/s), de set_rate()
+    (manual) o de update_from_window(): ventana / RTT, para repartir una ventana por RTT.
+    Un destino con tasa manual no se pisa con la estimada.
+    """
+    def __init__(self, rate: float = 0.0, global_rate: float = 0.0, burst_frames: int = 2,
+                 auto: bool = False, gain: float = 1.25, min_rate: float = 64 * 1024):
+        self.default_rate = float(rate)
+        self.auto = auto
+        self.gain = gain
+        self.min_rate = min_rate
+        self._burst = max(1, burst_frames) * 1500
+        self._global = TokenBucket(global_rate, self._burst) if global_rate > 0 else None
+        self._peers: Dict[str, PeerPacing] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_rate > 0 or self.auto or self._global is not None or bool(self._peers)
+
+    #  tasas
+    def set_rate(self, mac: str, rate: float, source: str = "manual"):
+        """Fija la tasa (bytes/s) de un destino; rate <= 0 lo deja sin límite."""
+        with self._lock:
+            peer = self._peer(mac)
+            peer.bucket.rate = float(rate)
+            peer.source = source
+
+    def update_from_window(self, mac: str, window_bytes: int, rtt_s: float):
+        """Control de congestión -> pacing: gain * ventana / RTT (si no hay tasa manual)."""
+        if not self.auto or rtt_s <= 0 or window_bytes <= 0:
+            return
+        with self._lock:
+            peer = self._peer(mac)
+            if peer.source == "manual":
+                return
+            peer.bucket.rate = max(self.min_rate, self.gain * window_bytes / rtt_s)
+            peer.source = "cc"
+
+    #  envío
+    def reserve(self, mac: str, nbytes: int, now: Optional[float] = None) -> float:
+        """
+        Si el frame puede salir ya, descuenta los tokens y devuelve 0;
+        si no, devuelve cuántos segundos faltan (sin descontar nada).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            peer = self._peer(mac)
+            wait = peer.bucket.delay(nbytes, now)
+            if self._global is not None:
+                wait = max(wait, self._global.delay(nbytes, now))
+            if wait > 0:
+                return wait
+            peer.bucket.consume(nbytes, now)
+            if self._global is not None:
+                self._global.consume(nbytes, now)
+            peer.frames += 1
+            peer.bytes += nbytes
+            return 0.0
+
+    def note_delayed(self, mac: str, wait_s: float):
+        with self._lock:
+            peer = self._peer(mac)
+            peer.delayed += 1
+            peer.wait_s += wait_s
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            out = {
+                mac: {
+                    "rate": round(p.bucket.rate),
+                    "source": p.source,
+                    "frames": p.frames,
+                    "bytes": p.bytes,
+                    "delayed": p.delayed,
+                    "wait_s": round(p.wait_s, 3),
+                }
+                for mac, p in self._peers.items()
+            }
+        if self._global is not None:
+            out["*"] = {"rate": round(self._global.rate), "source": "global"}
+        return out
+
+    def _peer(self, mac: str) -> PeerPacing:
+        peer = self._peers.get(mac)
+        if peer is None:
+            peer = self._peers[mac] = PeerPacing(TokenBucket(self.default_rate, self._burst))
+        return peer
@@ -0,0 +1,100 @@
+import logging
+import secrets
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Tuple
+
+from src.core.enums.enums import MessageType
+from src.core.schemas.frame_schemas import FrameSchema
+from src.file_transfer.helpers.parse_payload import parse_payload
+
+if TYPE_CHECKING:
+    from src.core.managers.service_threads import ThreadManager
+
+
+class PathMtuProber:
+    """
+    Descubre el MTU de camino hacia un peer: manda a la vez un MTU_PROBE por cada tamaño
+    candidato (<= MTU local), rellenado para ocupar exactamente ese payload Ethernet, y
+    se queda con el mayor que el peer contesta con MTU_REPLY. Lo que no cabe en algún
+    salto (switch, driver Wi-Fi) simplemente no llega. El resultado se cachea ttl_s
+    (negative_ttl_s si el peer no contestó ninguna sonda).
+    """
+    CANDIDATES = (9000, 8192, 4096, 1500, 1492, 1400, 1280, 1024, 576)
+
+    def __init__(self, threads: "ThreadManager", local_mtu: int, timeout_s: float = 0.3, ttl_s: float = 600.0):
+        self._threads = threads
+        self.local_mtu = local_mtu
+        self.timeout_s = timeout_s
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = 30.0
+        self._cache: Dict[str, Tuple[int, float]] = {}     # mac -> (mtu, ts)
+        self._answers: Dict[str, set[int]] = {}             # probe_id -> tamaños confirmados
+        self._cond = threading.Condition()
+
+        threads.add_message_handler(MessageType.MTU_PROBE, self._on_probe)
+        threads.add_message_handler(MessageType.MTU_REPLY, self._on_reply)
+
+    def path_mtu(self, mac: str) -> int:
+        """MTU cacheado o recién medido; 0 si el peer no contestó ninguna sonda."""
+        cached = self._cache.get(mac)
+        if cached and time.time() - cached[1] < self.ttl_s:
+            return cached[0]
+        return self.probe(mac)
+
+    def probe(self, mac: str) -> int:
+        """Bloquea hasta timeout_s (o hasta que vuelve la sonda más grande)."""
+        sizes = sorted({s for s in self.CANDIDATES if s < self.local_mtu} | {self.local_mtu}, reverse=True)
+        probe_id = secrets.token_hex(4)
+        with self._cond:
+            self._answers[probe_id] = set()
+        for size in sizes:
+            frame = self._probe_frame(mac, probe_id, size)
+            if frame is not None:
+                self._threads.queue_frame_for_sending(frame)
+
+        deadline = time.time() + self.timeout_s
+        with self._cond:
+            while sizes[0] not in self._answers[probe_id]:
+                left = deadline - time.time()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            answered = self._answers.pop(probe_id)
+
+        mtu = max(answered, default=0)
+        # Sin respuesta también se cachea (menos tiempo): no repetir la espera por cada archivo
+        self._cache[mac] = (mtu, time.time() if mtu else time.time() - self.ttl_s + self.negative_ttl_s)
+        logging.info("[PMTU] %s -> %s (local=%d, confirmados=%s)", mac, mtu or "sin respuesta", self.local_mtu, sorted(answered))
+        return mtu
+
+    def snapshot(self) -> Dict[str, int]:
+        return {mac: mtu for mac, (mtu, _) in self._cache.items() if mtu}
+
+    def _probe_frame(self, mac: str, probe_id: str, size: int) -> FrameSchema | None:
+        head = f"probe_id={probe_id}\nsize={size}\n\n".encode("utf-8")
+        pad = size - self._threads.frame_overhead - len(head)
+        if pad < 0:
+            return None
+        return self._threads.file_transfer_handler.get_frame(mac, MessageType.MTU_PROBE, head + bytes(pad))
+
+    def _on_probe(self, frame: FrameSchema):
+        head = frame.payload.split(b"\n\n", 1)[0]
+        kv = parse_payload(head.decode("utf-8", errors="replace") + "\n")
+        if not kv.get("probe_id") or not kv.get("size"):
+            return
+        payload = f"probe_id={kv['probe_id']}\nsize={kv['size']}\nmtu={self.local_mtu}\n".encode("utf-8")
+        reply = self._threads.file_transfer_handler.get_frame(frame.src_mac, MessageType.MTU_REPLY, payload)
+        self._threads.queue_frame_for_sending(reply)
+
+    def _on_reply(self, frame: FrameSchema):
+        kv = parse_payload(frame.payload.decode("utf-8", errors="replace"))
+        try:
+            size = int(kv.get("size", "0"))
+        except ValueError:
+            return
+        with self._cond:
+            answered = self._answers.get(kv.get("probe_id", ""))
+            if answered is not None:
+                answered.add(size)
+                self._cond.notify_all()
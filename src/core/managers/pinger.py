@@ -0,0 +1,101 @@
+import itertools
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+from src.core.enums.enums import MessageType
+from src.core.schemas.frame_schemas import FrameSchema
+from src.file_transfer.helpers.parse_payload import parse_payload
+
+if TYPE_CHECKING:
+    from src.core.managers.service_threads import ThreadManager
+
+
+class Pinger:
+    """
+    Ping de capa 2: PING lleva seq + timestamp (y relleno hasta `size`), el peer devuelve
+    el mismo payload en un PONG. Ambos viajan por el carril de control en las dos
+    direcciones, así la latencia medida no incluye la cola de DATA.
+    Cada RTT medido también alimenta a LinkStatsTable (RTT inicial antes de transferir).
+    """
+    def __init__(self, threads: "ThreadManager"):
+        self._threads = threads
+        self._seq = itertools.count(1)
+        self._pending: Dict[int, Tuple[str, float]] = {}    # seq -> (mac, enviado)
+        self._rtts: Dict[int, float] = {}
+        self._cond = threading.Condition()
+
+        threads.add_message_handler(MessageType.PING, self._on_ping)
+        threads.add_message_handler(MessageType.PONG, self._on_pong)
+
+    def run(self, mac: str, count: int = 5, interval_s: float = 0.2, size: int = 64,
+            timeout_s: float = 1.0) -> Dict[str, Any]:
+        """Serie de `count` PINGs cada `interval_s`; bloquea hasta timeout_s tras el último."""
+        max_size = self._threads.local_mtu - self._threads.frame_overhead
+        size = min(max(0, size), max_size)
+        seqs = []
+        for i in range(count):
+            seq = next(self._seq)
+            seqs.append(seq)
+            sent = time.monotonic()
+            head = f"seq={seq}\nts={time.monotonic_ns()}\n\n".encode("utf-8")
+            frame = self._threads.file_transfer_handler.get_frame(
+                mac, MessageType.PING, head + bytes(max(0, size - len(head)))
+            )
+            with self._cond:
+                self._pending[seq] = (mac, sent)
+            self._threads.queue_frame_for_sending(frame)
+            if i + 1 < count:
+                time.sleep(interval_s)
+
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while not all(s in self._rtts for s in seqs):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            for s in seqs:
+                self._pending.pop(s, None)
+            rtts = [self._rtts.pop(s) for s in seqs if s in self._rtts]
+
+        return self._summary(mac, count, size, rtts)
+
+    @staticmethod
+    def _summary(mac: str, count: int, size: int, rtts: list[float]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "mac": mac, "size": size, "sent": count, "received": len(rtts),
+            "loss": round(1 - len(rtts) / count, 4) if count else 0.0,
+        }
+        if rtts:
+            ordered = sorted(rtts)
+            p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+            out.update(
+                min_ms=round(ordered[0] * 1000, 3),
+                avg_ms=round(sum(ordered) / len(ordered) * 1000, 3),
+                p99_ms=round(p99 * 1000, 3),
+                max_ms=round(ordered[-1] * 1000, 3),
+            )
+        return out
+
+    def _on_ping(self, frame: FrameSchema):
+        pong = self._threads.file_transfer_handler.get_frame(frame.src_mac, MessageType.PONG, frame.payload)
+        self._threads.queue_frame_for_sending(pong)
+
+    def _on_pong(self, frame: FrameSchema):
+        now = time.monotonic()
+        kv = parse_payload(frame.payload.split(b"\n\n", 1)[0].decode("utf-8", errors="replace"))
+        try:
+            seq = int(kv.get("seq", "0"))
+        except ValueError:
+            return
+        with self._cond:
+            pending = self._pending.get(seq)
+            if not pending or pending[0] != frame.src_mac or seq in self._rtts:
+                return
+            rtt = now - pending[1]
+            self._rtts[seq] = rtt
+            self._cond.notify_all()
+        self._threads.link_stats.on_rtt(frame.src_mac, rtt)
+        logging.debug("[PING] pong seq=%d de %s rtt=%.3fms", seq, frame.src_mac, rtt * 1000)
@@ -1,12 +1,15 @@
 import logging
 import socket
 
+from src.prepare.network_config import get_interface_mtu
+
 class SocketManager:
     def __init__(self, interface: str, ethertype: int):
         self.interface = interface
         self.ethertype = ethertype
         self._socket = None
         self.mac = None 
+        self.mtu = get_interface_mtu(interface)
 
     def __enter__(self):
         try:
@@ -20,7 +23,7 @@ class SocketManager:
 
             logging.info(
                 f"Socket crudo creado y vinculado a la interfaz '{self.interface}' "
-                f"con EtherType {hex(self.ethertype)}. MAC local={self.mac}"
+                f"con EtherType {hex(self.ethertype)}. MAC local={self.mac} MTU={self.mtu}"
             )
             return self
         except PermissionError:
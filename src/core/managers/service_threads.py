@@ -1,15 +1,29 @@
 import logging
+import os
 import queue
 import threading
 import time
-from typing import Callable, Dict
+import zlib
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+from src.core.helpers.bundle import Bundler, unpack_bundle
 from src.core.helpers.frame_creator import create_ethernet_frame
+from src.core.managers.frame_queue import FrameQueue
+from src.core.managers.io_workers import IOWorkerPool
+from src.core.managers.link_stats import LinkStatsTable
+from src.core.managers.ordered_pool import OrderedWorkerPool
+from src.core.managers.pacer import FRAME_OVERHEAD, Pacer
+from src.core.managers.path_mtu import PathMtuProber
+from src.core.managers.pinger import Pinger
 from src.core.managers.raw_socket import SocketManager
-from src.core.enums.enums import MessageType
+from src.core.managers.transfer_scheduler import TransferScheduler
+from src.core.enums.enums import FileTxState, MessageType
+from src.core.enums.formats import HeaderFormat
 from src.core.helpers.frame_decoder import decode_ethernet_frame
 from src.core.schemas.frame_schemas import FrameSchema
 from src.core.schemas.scheduled_task import ScheduledTask
 from src.file_transfer.handlers.file_transfer_handler import FileTransferHandler
+from src.file_transfer.helpers.tx_state import set_tx_state
 from src.file_transfer.schemas.send_ctx import FileSendCtxSchema
 from src.security.security_manager import SecurityManager
 
@@ -18,28 +32,105 @@ class ThreadManager:
     Orquesta los hilos de trabajo para la aplicación de chat.
     Gestiona la recepción, el envío, el procesamiento de mensajes y las tareas periódicas.
     """
+    # Tipos que no esperan detrás de transferencias de archivos
+    CONTROL_TYPES = frozenset({
+        MessageType.APP_MESSAGE,
+        MessageType.DISCOVER_REQUEST,
+        MessageType.DISCOVER_REPLY,
+        MessageType.MTU_PROBE,
+        MessageType.MTU_REPLY,
+        MessageType.PING,
+        MessageType.PONG,
+    })
+    # Tipos que en la salida adelantan a todo lo encolado (mediciones de latencia)
+    PRIORITY_TYPES = frozenset({MessageType.PING, MessageType.PONG})
+
     def __init__(self, socket_manager: SocketManager, file_transfer_handler : FileTransferHandler, security: SecurityManager):
         self._socket_manager = socket_manager
         self._started = False
-        self._incoming_queue: queue.Queue[FrameSchema] = queue.Queue()
-        self._outgoing_queue: queue.Queue[FrameSchema] = queue.Queue()
+        # Entrada: un carril rápido para control y N shards con afinidad por stream.
+        # Todas las colas son acotadas y descartan por tipo bajo presión (ver FrameQueue)
+        in_max = int(os.environ.get("INCOMING_QUEUE_MAX", "4096"))
+        self._control_queue = FrameQueue("incoming-ctl", maxsize=in_max)
+        self._shard_queues: list[FrameQueue] = [
+            FrameQueue(f"incoming-{i}", maxsize=in_max)
+            for i in range(max(1, int(os.environ.get("DISPATCH_SHARDS", "2"))))
+        ]
+        self._outgoing_queue = FrameQueue(
+            "outgoing", maxsize=int(os.environ.get("OUTGOING_QUEUE_MAX", "4096")), priority=self.PRIORITY_TYPES
+        )
         self._shutdown_event = threading.Event()
+        # Despierta al scheduler antes de tiempo cuando una tarea adelanta su próxima corrida
+        self._scheduler_wakeup = threading.Event()
         self.file_transfer_handler = file_transfer_handler
         self.security = security
+        if security:
+            security.bind_sender(self.queue_frame_for_sending)
+        # Tipos autenticados por el tag de seguridad: el receptor no les verifica CRC y,
+        # con SEC_SKIP_CRC=1, el emisor tampoco lo calcula (checksum 0). Con peers que
+        # no conozcan este modo hay que usar SEC_SKIP_CRC=0.
+        self._crc_free_types = security.authenticated_types if security else frozenset()
+        self._send_crc_free = bool(security) and os.environ.get("SEC_SKIP_CRC", "1") != "0"
 
         self._message_handlers: Dict[MessageType, Callable[[FrameSchema], None]] = {}
         self._scheduled_tasks: list[ScheduledTask] = []
 
         self._ctx_by_id: Dict[str, FileSendCtxSchema] = {}
+        # Reparto justo entre transferencias; _tx_queue_target acota cuántos frames
+        # pueden esperar en la cola de salida (más allá de eso el orden sería FIFO)
+        self.transfer_scheduler = TransferScheduler(quantum=int(os.environ.get("TX_DRR_QUANTUM", "4")))
+        self._tx_queue_target = int(os.environ.get("TX_QUEUE_TARGET", "64"))
+
+        # Pacing de FILE_DATA por destino (bytes/s; 0 = sin límite). Los frames que aún no
+        # tienen tokens esperan en _paced[dst] en orden, sin frenar al resto de la salida
+        self.pacer = Pacer(
+            rate=float(os.environ.get("PACING_RATE", "0")),
+            global_rate=float(os.environ.get("PACING_GLOBAL_RATE", "0")),
+            burst_frames=int(os.environ.get("PACING_BURST", "2")),
+            auto=os.environ.get("PACING_AUTO", "0") == "1",
+        )
+        self._paced: Dict[str, Deque[FrameSchema]] = {}
+        self._paced_backlog = 0
+        # Calidad de enlace por peer (RTT, pérdida, goodput)
+        self.link_stats = LinkStatsTable()
+
+        # MTU local y de camino por peer; frame_overhead = header del protocolo + sobre de seguridad
+        self.local_mtu = getattr(socket_manager, "mtu", 0) or 1500
+        self.frame_overhead = HeaderFormat.get_len_with_checksum() + (security.overhead if security else 0)
+        # Agregación de frames chicos de control por destino (BUNDLE_WINDOW_MS=0 la desactiva).
+        # El BUNDLE entero (header + sobre + items) tiene que entrar en el MTU local
+        self.bundler = Bundler(
+            window_s=float(os.environ.get("BUNDLE_WINDOW_MS", "2")) / 1000,
+            max_bytes=min(int(os.environ.get("BUNDLE_MAX_BYTES", "1400")), self.local_mtu - self.frame_overhead),
+        )
+        self.path_mtu = PathMtuProber(self, self.local_mtu)
+        self.pinger = Pinger(self)
+
+        # Etapa de cifrado/verificación en paralelo (SEC_CRYPTO_WORKERS=0: en línea en
+        # sender/receiver). El orden se conserva por destino (tx) y por origen (rx)
+        crypto_workers = int(os.environ.get("SEC_CRYPTO_WORKERS", "0"))
+        self.crypto_tx = self.crypto_rx = None
+        if crypto_workers > 0:
+            self.crypto_tx = OrderedWorkerPool(self._seal, self._socket_manager.send_raw_frame,
+                                               workers=crypto_workers, name="crypto-tx")
+            self.crypto_rx = OrderedWorkerPool(self._open_frame, self._deliver,
+                                               workers=crypto_workers, name="crypto-rx")
+
+        # I/O de disco fuera del dispatcher (escrituras de chunks ordenadas por archivo)
+        self.io_pool = IOWorkerPool(workers=int(os.environ.get("IO_WORKERS", "2")))
 
 
         self.receiver =     threading.Thread(target=self._receiver_loop,    name="receiver",    daemon=True)
         self.sender =       threading.Thread(target=self._sender_loop,      name="sender",      daemon=True)
         self.scheduler =    threading.Thread(target=self._scheduler_loop,   name="scheduler",   daemon=True)
-        self.dispatcher =   threading.Thread(target=self._dispatcher_loop,  name="dispatcher",  daemon=True)
+        self.dispatcher =   threading.Thread(target=self._dispatcher_loop,  args=(self._control_queue,), name="dispatcher-ctl", daemon=True)
+        self.shard_dispatchers = [
+            threading.Thread(target=self._dispatcher_loop, args=(q,), name=f"dispatcher-{i}", daemon=True)
+            for i, q in enumerate(self._shard_queues)
+        ]
         self.file_sender_thread =  threading.Thread(target=self._file_sender_loop, name="file_sender", daemon=True)
 
-        self.threads = [self.receiver, self.sender, self.scheduler, self.dispatcher, self.file_sender_thread]
+        self.threads = [self.receiver, self.sender, self.scheduler, self.dispatcher, *self.shard_dispatchers, self.file_sender_thread]
 
 
     def _receiver_loop(self):
@@ -51,72 +142,186 @@ class ThreadManager:
                 if not frame_bytes:
                     continue
 
-                try:
-                    decoded_frame = decode_ethernet_frame(frame_bytes)
-                except ValueError as e:
-                    # Tip: ValueError lo usamos cuando el CRC no coincide (frame corrupto)
-                    logging.warning(f"[Receiver] Frame descartado (CRC inválido): {e}")
-                    continue  # no encolar
-
-                if decoded_frame is None:
-                    # Tip: Si tu decoder devuelve None para tipos/ethertype ajenos, simplemente ignora
+                if self.crypto_rx:
+                    # El orden importa por origen: carril = MAC origen cruda
+                    self.crypto_rx.submit(frame_bytes[6:12], frame_bytes)
                     continue
 
-                if self.security:
-                    decoded_frame = self.security.accept_incoming(decoded_frame)
-                    if decoded_frame is None:
-                        continue
-
-                self._incoming_queue.put(decoded_frame)
+                decoded_frame = self._open_frame(frame_bytes)
+                if decoded_frame is not None:
+                    self._deliver(decoded_frame)
 
             except Exception as e:
                 logging.error(f"[Receiver] Error: {e}")
                 time.sleep(1)  # Evitar un bucle de error muy rápido
 
+    def _open_frame(self, frame_bytes: bytes) -> FrameSchema | None:
+        """Decodifica (CRC) y verifica/descifra; None si el frame se descarta."""
+        try:
+            decoded_frame = decode_ethernet_frame(frame_bytes, self._crc_free_types)
+        except ValueError as e:
+            # Tip: ValueError lo usamos cuando el CRC no coincide (frame corrupto)
+            logging.warning(f"[Receiver] Frame descartado (CRC inválido): {e}")
+            if len(frame_bytes) >= 12:
+                self.link_stats.on_crc_error(":".join(f"{b:02x}" for b in frame_bytes[6:12]))
+            return None  # no encolar
+
+        if decoded_frame is None:
+            # Tip: Si tu decoder devuelve None para tipos/ethertype ajenos, simplemente ignora
+            return None
+
+        if self.security:
+            decoded_frame = self.security.accept_incoming(decoded_frame)
+        return decoded_frame
+
+    def _deliver(self, decoded_frame: FrameSchema):
+        """Desarma BUNDLEs y rutea cada frame a su cola de entrada."""
+        if decoded_frame.header.message_type == MessageType.BUNDLE:
+            try:
+                inner_frames = unpack_bundle(decoded_frame)
+            except ValueError as e:
+                logging.warning(f"[Receiver] BUNDLE descartado: {e}")
+                return
+            for inner in inner_frames:
+                self._route_incoming(inner)
+            return
+
+        self._route_incoming(decoded_frame)
+
     def _sender_loop(self):
         """Despacha mensajes desde la outgoing_queue."""
         logging.info("[Sender] Hilo iniciado.")
         while not self._shutdown_event.is_set():
             try:
-                frame_to_send = self._outgoing_queue.get(timeout=1)
-
-                if self.security:
-                    frame_to_send = self.security.protect_outgoing(frame_to_send)
-
-                frame_to_send_bytes = create_ethernet_frame(frame_to_send)
-                self._socket_manager.send_raw_frame(frame_to_send_bytes)
+                timeout = min(self._flush_paced(), self._flush_bundles())
+                frame_to_send = self._outgoing_queue.get(timeout=timeout)
+                if not self._defer_paced(frame_to_send) and not self._hold_for_bundle(frame_to_send):
+                    if frame_to_send.header.message_type != MessageType.FILE_DATA:
+                        # No adelantar META/FIN a los ACK/chat agrupados del mismo destino
+                        for ready in self.bundler.take(frame_to_send.dst_mac):
+                            self._transmit(ready)
+                    self._transmit(frame_to_send)
                 self._outgoing_queue.task_done()
             except queue.Empty:
                 continue
             except Exception as e:
                 logging.error(f"[Sender] Error: {e}")
 
+    def _transmit(self, frame: FrameSchema):
+        if self.crypto_tx:
+            self.crypto_tx.submit(frame.dst_mac, frame)
+            return
+        self._socket_manager.send_raw_frame(self._seal(frame))
+
+    def _seal(self, frame: FrameSchema) -> bytes:
+        """Protege (si hay seguridad) y arma los bytes Ethernet del frame."""
+        if self.security:
+            frame = self.security.protect_outgoing(frame)
+            if self._send_crc_free and frame.header.message_type in self._crc_free_types:
+                return create_ethernet_frame(frame, with_crc=False)
+        return create_ethernet_frame(frame)
+
+    def _defer_paced(self, frame: FrameSchema) -> bool:
+        """True si el FILE_DATA quedó esperando tokens (o detrás de otro del mismo destino)."""
+        if frame.header.message_type != MessageType.FILE_DATA or not self.pacer.enabled:
+            return False
+        pending = self._paced.get(frame.dst_mac)
+        if not pending:
+            wait = self.pacer.reserve(frame.dst_mac, len(frame.payload) + FRAME_OVERHEAD)
+            if wait <= 0:
+                return False
+            self.pacer.note_delayed(frame.dst_mac, wait)
+            pending = self._paced.setdefault(frame.dst_mac, deque())
+        pending.append(frame)
+        self._paced_backlog += 1
+        return True
+
+    def _hold_for_bundle(self, frame: FrameSchema) -> bool:
+        """True si el frame quedó en el Bundler (se envía al vencer la ventana o al llenarse)."""
+        ready = self.bundler.offer(frame, time.monotonic())
+        if ready is None:
+            return False
+        for out in ready:
+            self._transmit(out)
+        return True
+
+    def _flush_bundles(self) -> float:
+        if not self.bundler.enabled:
+            return 1.0
+        ready, next_wait = self.bundler.due(time.monotonic())
+        for out in ready:
+            self._transmit(out)
+        return max(0.001, next_wait)
+
+    def _flush_paced(self) -> float:
+        """Envía los frames diferidos que ya tienen tokens; devuelve cuánto esperar al próximo."""
+        next_wait = 1.0
+        for dst, pending in list(self._paced.items()):
+            while pending:
+                wait = self.pacer.reserve(dst, len(pending[0].payload) + FRAME_OVERHEAD)
+                if wait > 0:
+                    next_wait = min(next_wait, wait)
+                    break
+                self._paced_backlog -= 1
+                self._transmit(pending.popleft())
+            if not pending:
+                self._paced.pop(dst, None)
+        return max(0.001, next_wait)
+
     def _scheduler_loop(self):
         logging.info("[Scheduler] Hilo iniciado.")
         
         while not self._shutdown_event.is_set():
             current_time = time.time()
             
-            for task in self._scheduled_tasks:
+            self._scheduler_wakeup.clear()
+            for task in list(self._scheduled_tasks):
                 if current_time - task.last_run >= task.interval:
+                    # last_run antes de correr: la tarea puede reprogramarse (interval) desde la acción
+                    task.last_run = current_time
                     try:
-                        logging.info(f"[Scheduler] Ejecutando tarea periódica: {task.action.__name__}")
+                        logging.debug(f"[Scheduler] Ejecutando tarea periódica: {task.action.__name__}")
                         task.action()
-                        
-                        task.last_run = current_time
                     except Exception as e:
                         logging.error(f"[Scheduler] Error ejecutando la tarea {task.action.__name__}: {e}")
 
-            # Espera un poco para no consumir 100% de CPU.
-            self._shutdown_event.wait(timeout=1)
+            # Dormir hasta la próxima tarea vencida (máx. 1 s) para no consumir 100% de CPU.
+            self._scheduler_wakeup.wait(timeout=self._next_task_delay())
+
+    def _next_task_delay(self) -> float:
+        now = time.time()
+        delays = [t.last_run + t.interval - now for t in list(self._scheduled_tasks)]
+        return min([1.0] + [max(0.005, d) for d in delays])
         
 
-    def _dispatcher_loop(self):
-        """Procesa mensajes de la incoming_queue."""
-        logging.info("[Dispatcher] Hilo iniciado.")
+    def _route_incoming(self, frame: FrameSchema):
+        """
+        Control (chat, discovery) va al carril rápido; el resto a un shard elegido por
+        file_id (o MAC origen), así META/DATA/FIN de un mismo stream mantienen su orden
+        y streams distintos se procesan en paralelo.
+        """
+        if frame.header.message_type in self.CONTROL_TYPES:
+            self._control_queue.put(frame)
+            return
+        key = self._stream_key(frame)
+        self._shard_queues[zlib.crc32(key) % len(self._shard_queues)].put(frame)
+
+    @staticmethod
+    def _stream_key(frame: FrameSchema) -> bytes:
+        # Los payloads de archivo empiezan con "file_id=<id>\n"
+        payload = frame.payload
+        if payload.startswith(b"file_id="):
+            end = payload.find(b"\n", 8)
+            if end != -1:
+                return payload[8:end]
+        return frame.src_mac.encode("ascii")
+
+    def _dispatcher_loop(self, incoming: FrameQueue):
+        """Procesa mensajes de una cola de entrada (carril de control o shard)."""
+        logging.info(f"[Dispatcher] Hilo {threading.current_thread().name} iniciado.")
         while not self._shutdown_event.is_set():
             try:
-                received_frame = self._incoming_queue.get(timeout=1)
+                received_frame = incoming.get(timeout=1)
                 
                 handler = self._message_handlers.get(received_frame.header.message_type)
                 if handler:
@@ -138,29 +343,80 @@ class ThreadManager:
 
     def _pump(self):
         now = time.time()
+        sendable: list[FileSendCtxSchema] = []
         for ctx in list(self._ctx_by_id.values()):
             if ctx.finished:
                 self._ctx_by_id.pop(ctx.file_id)
                 continue
-            if ctx.meta_acked:
+            if not ctx.meta_acked:
+                with ctx.lock:
+                    self._retransfer_meta(ctx, now)
+                # Un archivo vacío también espera aquí: el receptor responde al META con un
+                # FIN (no ACK) y FileSender._on_fin lo da por terminado; hasta entonces se
+                # reintenta el META y vale meta_timeout_s
+                continue
+            else:
                 with ctx.lock:
                     self._retransfer_expired(ctx, now)
-
-                    if not ctx.finished:
-                        self._refill_window(ctx)
             
             # Completado
             if ctx.last_acked + 1 >= ctx.total_chunks and not ctx.finished:
                 frame: FrameSchema = self.file_transfer_handler.get_file_fin_frame(ctx, status="ok")
                 self.queue_frame_for_sending(frame)
                 with ctx.lock:
-                    ctx.finished = True     
+                    set_tx_state(ctx, FileTxState.FINISHED)
                 logging.debug("[TX] complete window file_id=%s last_acked=%d total=%d", ctx.file_id, ctx.last_acked, ctx.total_chunks)
+                continue
+
+            if not ctx.finished:
+                sendable.append(ctx)
+
+        if self.pacer.auto:
+            self._update_pacing(sendable)
+
+        # Chunks nuevos: solo lo que cabe en la cola de salida (y en la espera del pacer),
+        # repartido con DRR
+        budget = self._tx_queue_target - self._outgoing_queue.qsize() - self._paced_backlog
+        self.transfer_scheduler.schedule(sendable, budget, self._send_next_chunk)
+
+    def _update_pacing(self, sendable: list[FileSendCtxSchema]):
+        """Tasa por destino = ventanas de sus transferencias / RTT suavizado (ver Pacer)."""
+        per_dst: Dict[str, tuple[int, float]] = {}
+        for ctx in sendable:
+            if ctx.srtt_s <= 0:
+                continue
+            window_bytes, rtt = per_dst.get(ctx.dst_mac, (0, ctx.srtt_s))
+            window_bytes += ctx.send_window * (ctx.chunk_size + FRAME_OVERHEAD)
+            per_dst[ctx.dst_mac] = (window_bytes, min(rtt, ctx.srtt_s))
+        for dst, (window_bytes, rtt) in per_dst.items():
+            self.pacer.update_from_window(dst, window_bytes, rtt)
+
+    def _retransfer_meta(self, ctx: FileSendCtxSchema, now: float):
+        """Handshake META: reenvía si no hubo ACK y aborta al vencer meta_timeout_s."""
+        if ctx.finished:
+            return
+        if now - ctx.meta_started_ts >= ctx.meta_timeout_s:
+            frame: FrameSchema = self.file_transfer_handler.get_file_fin_frame(ctx, "error", "meta_timeout")
+            self.queue_frame_for_sending(frame)
+            set_tx_state(ctx, FileTxState.FAILED, "meta_timeout")
+            return
+        if ctx.meta_sent_ts > 0 and now - ctx.meta_sent_ts >= ctx.meta_retry_s:
+            frame: FrameSchema = self.file_transfer_handler.get_meta_frame(
+                ctx=ctx, file_name=ctx.file_name, rel_path=ctx.rel_path
+            )
+            self.queue_frame_for_sending(frame)
+            ctx.meta_sent_ts = now
+            logging.debug("[META->] retry file_id=%s", ctx.file_id)
 
     def _mark_inflight(self, ctx : FileSendCtxSchema, idx: int, retries: int = 0) :
         ctx.inflight[idx] = (time.time(), retries) 
 
     def _retransfer_expired(self, ctx: FileSendCtxSchema, now: float):
+        # 0) Ventana cero: el receptor está atrasado (no hubo pérdida); solo sondear
+        if ctx.rwnd == 0:
+            self._probe_zero_window(ctx, now)
+            return
+
         # 1) Retransmitir vencidos
         for idx, (last_time, retries) in list(ctx.inflight.items()):
             if now - last_time >= ctx.timeout_s:
@@ -175,18 +431,47 @@ class ThreadManager:
                         idx, ctx.file_id, retries + 1, ctx.timeout_s
                     )
                     self.queue_frame_for_sending(frame)
-                    ctx.finished = True
+                    set_tx_state(ctx, FileTxState.FAILED, "timeout")
                     break
                 frame : FrameSchema = self.file_transfer_handler.get_data_chunk(ctx, idx)
                 self.queue_frame_for_sending(frame)
                 self._mark_inflight(ctx, idx, retries=retries+1)
+                self.link_stats.on_retransmit(ctx.dst_mac)
                 logging.debug(
                     "[RTX] retransmit idx=%d file_id=%s retry=%d timeout=%.2fs",
                     idx, ctx.file_id, retries + 1, ctx.timeout_s
                 )
 
-    def _refill_window(self, ctx: FileSendCtxSchema):
-        while len(ctx.inflight) < ctx.window_size and ctx.next_to_send < ctx.total_chunks:
+    def _probe_zero_window(self, ctx: FileSendCtxSchema, now: float):
+        """
+        Con rwnd=0 reenvía el primer chunk sin confirmar cada probe_interval_s (con backoff
+        hasta 2 s); el receptor responde con un ACK que trae la ventana actualizada.
+        Si max_retries sondeos seguidos quedan sin respuesta el receptor se da por caído.
+        """
+        if now - ctx.probe_ts < ctx.probe_interval_s:
+            return
+        idx = ctx.last_acked + 1
+        if idx >= ctx.total_chunks:
+            return
+        if ctx.probe_unanswered >= ctx.max_retries:
+            frame: FrameSchema = self.file_transfer_handler.get_file_fin_frame(ctx, status="error", reason="timeout")
+            self.queue_frame_for_sending(frame)
+            set_tx_state(ctx, FileTxState.FAILED, "timeout")
+            logging.info("[TX] zero-window probes unanswered, file_id=%s failed", ctx.file_id)
+            return
+        ctx.probe_unanswered += 1
+        frame: FrameSchema = self.file_transfer_handler.get_data_chunk(ctx, idx)
+        self.queue_frame_for_sending(frame)
+        if ctx.probe_ts:
+            ctx.probe_interval_s = min(2.0, ctx.probe_interval_s * 2)
+        ctx.probe_ts = now
+        logging.debug("[TX] zero-window probe idx=%d file_id=%s", idx, ctx.file_id)
+
+    def _send_next_chunk(self, ctx: FileSendCtxSchema) -> bool:
+        """Envía el próximo chunk si la ventana lo permite; False si no hay lugar o datos."""
+        with ctx.lock:
+            if ctx.finished or len(ctx.inflight) >= ctx.send_window or ctx.next_to_send >= ctx.total_chunks:
+                return False
             idx = ctx.next_to_send
             frame : FrameSchema = self.file_transfer_handler.get_data_chunk(ctx, idx)
 
@@ -197,38 +482,74 @@ class ThreadManager:
 
             self.queue_frame_for_sending(frame)
             self._mark_inflight(ctx, idx)
+            self.link_stats.on_sent(ctx.dst_mac)
             ctx.next_to_send += 1
+            return True
 
 
     def start(self):
         if self._started:
             return
         self._started = True
+        self.io_pool.start()
+        if self.security:
+            self.security.start_keystream_pool(self.local_mtu)
+        for pool in (self.crypto_tx, self.crypto_rx):
+            if pool:
+                pool.start()
         for thread in self.threads:
             thread.start()
 
     def stop(self):
         self._shutdown_event.set()
+        self._scheduler_wakeup.set()
 
         for thread in self.threads:
             thread.join()
+        self.io_pool.stop()
+        if self.security:
+            self.security.stop_keystream_pool()
+        for pool in (self.crypto_tx, self.crypto_rx):
+            if pool:
+                pool.stop()
 
     @property
     def src_mac(self) -> str | None:
         return getattr(self._socket_manager, "mac", None)
     
-    def queue_frame_for_sending(self, frame: FrameSchema):
-        self._outgoing_queue.put(frame)
+    def queue_frame_for_sending(self, frame: FrameSchema) -> bool:
+        """Encola para enviar; False si la cola de salida lo descartó por presión."""
+        return self._outgoing_queue.put(frame)
+
+    def queue_stats(self) -> Dict[str, dict]:
+        """Ocupación, high-water mark y descartes por tipo de cada cola."""
+        queues = [self._control_queue, *self._shard_queues, self._outgoing_queue]
+        return {q.name: q.stats() for q in queues}
+
+    def pacing_stats(self) -> Dict[str, dict]:
+        """Tasa, origen de la tasa, bytes/frames enviados y esperas por destino."""
+        stats = self.pacer.stats()
+        for dst, pending in list(self._paced.items()):
+            if dst in stats:
+                stats[dst]["backlog"] = len(pending)
+        return stats
 
     def add_message_handler(self, msg_type: MessageType, f: Callable[[FrameSchema], None]):
         self._message_handlers[msg_type] = f
 
+    def get_message_handler(self, msg_type: MessageType) -> Optional[Callable[[FrameSchema], None]]:
+        return self._message_handlers.get(msg_type)
+
     def remove_message_handler(self, msg_type: MessageType):
         self._message_handlers.pop(msg_type, None)
 
     def add_scheduled_task(self, task: ScheduledTask):
         self._scheduled_tasks.append(task)
 
+    def wake_scheduler(self):
+        """Revisa las tareas ya (tras acortar el interval de una), sin esperar el sueño en curso."""
+        self._scheduler_wakeup.set()
+
     def remove_scheduled_task(self, action: Callable[[], None]):
         self._scheduled_tasks = [
             t for t in self._scheduled_tasks if t.action is not action
@@ -238,4 +559,11 @@ class ThreadManager:
         self._ctx_by_id[id] = ctx 
 
     def get_ctx_by_id(self, id: str) -> FileSendCtxSchema | None:
-        return self._ctx_by_id.get(id)
\ No newline at end of file
+        return self._ctx_by_id.get(id)
+
+    def set_ctx_weight(self, id: str, weight: float) -> bool:
+        ctx = self._ctx_by_id.get(id)
+        if not ctx or weight <= 0:
+            return False
+        ctx.weight = float(weight)
+        return True
\ No newline at end of file
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable
+
+from src.file_transfer.schemas.send_ctx import FileSendCtxSchema
+
+
+class TransferScheduler:
+    """
+    Reparte el envío de chunks entre transferencias con Deficit Round Robin.
+
+    Cada ronda otorga a cada par destino (dst_mac) `quantum` chunks escalados por el
+    mayor peso de sus transferencias, y ese crédito se divide entre las transferencias
+    del par según ctx.weight. Así un respaldo grande no acapara el enlace: una
+    transferencia chica hacia el mismo (u otro) par recibe su parte en cada ronda.
+    """
+    def __init__(self, quantum: int = 4):
+        self.quantum = max(1, int(quantum))
+        # file_id -> déficit acumulado (en chunks); el orden es el turno de la ronda
+        self._deficit: "OrderedDict[str, float]" = OrderedDict()
+
+    def schedule(self, ctxs: Iterable[FileSendCtxSchema], budget: int,
+                 send_one: Callable[[FileSendCtxSchema], bool]) -> int:
+        """
+        Reparte hasta `budget` envíos entre `ctxs`. send_one(ctx) intenta enviar el
+        siguiente chunk y devuelve False si la ventana del contexto está llena.
+        Devuelve cuántos chunks se enviaron.
+        """
+        active: Dict[str, FileSendCtxSchema] = {c.file_id: c for c in ctxs}
+        for file_id in [f for f in self._deficit if f not in active]:
+            self._deficit.pop(file_id, None)
+        for file_id in active:
+            self._deficit.setdefault(file_id, 0.0)
+        if budget <= 0 or not active:
+            return 0
+
+        shares = self._shares(active.values())
+        sent = 0
+        while budget > 0:
+            progressed = False
+            for file_id in list(self._deficit.keys()):
+                if budget <= 0:
+                    break
+                ctx = active[file_id]
+                deficit = self._deficit[file_id] + self.quantum * shares[file_id]
+                while deficit >= 1.0 and budget > 0:
+                    if not send_one(ctx):
+                        # Sin ventana/datos: como en DRR, un flujo inactivo no acumula crédito
+                        deficit = 0.0
+                        break
+                    deficit -= 1.0
+                    budget -= 1
+                    sent += 1
+                    progressed = True
+                self._deficit[file_id] = deficit
+            if not progressed:
+                break
+
+        # El turno rota para que ningún contexto quede siempre primero
+        if self._deficit:
+            self._deficit.move_to_end(next(iter(self._deficit)))
+        return sent
+
+    def _shares(self, ctxs: Iterable[FileSendCtxSchema]) -> Dict[str, float]:
+        by_peer: Dict[str, list[FileSendCtxSchema]] = {}
+        for ctx in ctxs:
+            by_peer.setdefault(ctx.dst_mac, []).append(ctx)
+
+        shares: Dict[str, float] = {}
+        for peer_ctxs in by_peer.values():
+            weights = [max(ctx.weight, 0.01) for ctx in peer_ctxs]
+            peer_weight, total = max(weights), sum(weights)
+            for ctx, w in zip(peer_ctxs, weights):
+                shares[ctx.file_id] = peer_weight * w / total
+        return shares
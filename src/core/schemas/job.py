@@ -0,0 +1,41 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.core.enums.enums import JobStatus
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str                                   # tipo de comando IPC (file_send, folder_send...)
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    result: Any = None
+    error: str = ""
+    file_ids: List[str] = field(default_factory=list)   # transferencias lanzadas por el job
+    created_ts: float = field(default_factory=time.time)
+    started_ts: float = 0.0
+    finished_ts: float = 0.0
+
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.DONE, JobStatus.ERROR, JobStatus.CANCELED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "result": self.result,
+            "error": self.error or None,
+            "file_ids": list(self.file_ids),
+            "created_ts": self.created_ts,
+            "started_ts": self.started_ts or None,
+            "finished_ts": self.finished_ts or None,
+        }
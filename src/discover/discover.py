@@ -1,5 +1,7 @@
+import threading
 import time
-from typing import Callable, Dict, Any, Optional
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from src.core.managers.service_threads import ThreadManager
 from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema
 from src.core.schemas.scheduled_task import ScheduledTask
@@ -7,21 +9,42 @@ from src.core.enums.enums import MessageType
 from src.prepare.network_config import get_ether_type
 
 
+# Ciclo de vida de un vecino:
+#   online  --(sin DISCOVER_REPLY por suspect_after)-->  suspect
+#   suspect --(sin DISCOVER_REPLY por expire_after)-->   expired: se quita de la tabla
+#   suspect --(DISCOVER_REPLY)-->                        online
+ONLINE = "online"
+SUSPECT = "suspect"
+EXPIRED = "expired"
+
+
 class Discovery:
     BROADCAST_MAC = "ff:ff:ff:ff:ff:ff"
 
-    def __init__(self, service_threads: ThreadManager, alias: str, interval_seconds: float = 5.0):
+    def __init__(self, service_threads: ThreadManager, alias: str, interval_seconds: float = 5.0,
+                 suspect_after: float = 15.0, expire_after: float = 60.0, sweep_interval: float = 1.0):
         self._attached = False
         self.service_threads = service_threads
         self.alias = alias
         self.interval = interval_seconds
-
-        self.neighbors: Dict[str, Dict[str, Any]] = {}
+        self.suspect_after = suspect_after
+        self.expire_after = max(expire_after, suspect_after)
+        self.sweep_interval = sweep_interval
+
+        # mac -> {"alias", "last_seen", "state"}, en orden de last_seen (el más viejo primero):
+        # el barrido recorre desde el principio y corta en el primer vecino fresco
+        self.neighbors: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Índices por estado (dicts como sets ordenados) para no recorrer la tabla entera
+        self._by_state: Dict[str, Dict[str, None]] = {ONLINE: {}, SUSPECT: {}}
+        self._lock = threading.Lock()
+        # Se incrementa con cada lote de cambios: permite detectar diffs perdidos
+        self.revision = 0
 
         self.src_mac = self.service_threads.src_mac
 
-        #Callback para detectar cambios en la tabla de vecinos
-        self.on_neighbors_changed: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None
+        # Callback con los cambios reales (alias o estado), no con cada DISCOVER_REPLY:
+        # cb({"rev": n, "changes": [{"op": "add"|"update"|"remove", "mac", "alias", "online", "state"}]})
+        self.on_neighbors_diff: Optional[Callable[[Dict[str, Any]], None]] = None
 
         self._seq: int = 0
 
@@ -40,6 +63,9 @@ class Discovery:
         self.service_threads.add_scheduled_task(
             ScheduledTask(action=self._timer_cb_discover, interval=self.interval)
         )
+        self.service_threads.add_scheduled_task(
+            ScheduledTask(action=self._sweep, interval=self.sweep_interval)
+        )
 
     def detach(self):
         """
@@ -48,11 +74,41 @@ class Discovery:
         self.service_threads.remove_message_handler(MessageType.DISCOVER_REQUEST)
         self.service_threads.remove_message_handler(MessageType.DISCOVER_REPLY)
         self.service_threads.remove_scheduled_task(self._timer_cb_discover)
+        self.service_threads.remove_scheduled_task(self._sweep)
         
   
     #  API externa 
-    def set_on_neighbors_changed(self, cb: Callable[[Dict[str, Dict[str, Any]]], None]):
-        self.on_neighbors_changed = cb
+    def set_on_neighbors_diff(self, cb: Callable[[Dict[str, Any]], None]):
+        self.on_neighbors_diff = cb
+
+    def snapshot(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """Tabla completa (para bootstrap o resync de la UI) y la revisión a la que corresponde."""
+        now = time.time()
+        with self._lock:
+            rows = [
+                {
+                    "mac": mac,
+                    "alias": meta.get("alias", "?"),
+                    "online": meta["state"] == ONLINE,
+                    "state": meta["state"],
+                    "last_seen_ms": int(1000 * max(0.0, now - meta.get("last_seen", 0.0))),
+                }
+                for mac, meta in self.neighbors.items()
+            ]
+            return self.revision, rows
+
+    def active_peers(self, include_suspect: bool = False) -> List[str]:
+        """MACs online (y suspect si se pide), desde el índice por estado."""
+        with self._lock:
+            peers = list(self._by_state[ONLINE])
+            if include_suspect:
+                peers.extend(self._by_state[SUSPECT])
+            return peers
+
+    def state_of(self, mac: str) -> str:
+        with self._lock:
+            entry = self.neighbors.get(mac)
+            return entry["state"] if entry else EXPIRED
 
     #  Timer: enviar discover 
     def _timer_cb_discover(self):
@@ -112,20 +168,74 @@ class Discovery:
         alias = self._parse_alias(payload_str)
         now = time.time()
 
-        entry = self.neighbors.get(mac_vecino)
-        if entry and entry.get("alias") == alias:
-            entry["last_seen"] = now
-        else:
-            self.neighbors[mac_vecino] = {"alias": alias, "last_seen": now}
-
-        if self.on_neighbors_changed:
-            try:
-                self.on_neighbors_changed(self.neighbors)
-            except Exception as e:
-                
-                print(f"[neighbors cb] error: {e}")
+        change = None
+        with self._lock:
+            entry = self.neighbors.get(mac_vecino)
+            if entry is None:
+                self.neighbors[mac_vecino] = {"alias": alias, "last_seen": now, "state": ONLINE}
+                self._by_state[ONLINE][mac_vecino] = None
+                change = self._change("add", mac_vecino, alias, ONLINE)
+            else:
+                # Lo habitual: mismo alias y ya online -> solo se mueve last_seen, sin evento
+                if entry["alias"] != alias or entry["state"] != ONLINE:
+                    change = self._change("update", mac_vecino, alias, ONLINE)
+                self._set_state(mac_vecino, entry, ONLINE)
+                entry.update(alias=alias, last_seen=now)
+                self.neighbors.move_to_end(mac_vecino)
+
+            if change:
+                self._emit_locked([change])
+
+    def _sweep(self):
+        """
+        Pasa a suspect a los vecinos sin respuesta en suspect_after y quita los que llevan
+        expire_after. Recorre desde el más viejo y corta en el primero que sigue online.
+        """
+        now = time.time()
+        changes = []
+        with self._lock:
+            for mac, meta in list(self.neighbors.items()):
+                age = now - meta["last_seen"]
+                if age <= self.suspect_after:
+                    break
+                if age > self.expire_after:
+                    self._set_state(mac, meta, EXPIRED)
+                    del self.neighbors[mac]
+                    changes.append(self._change("remove", mac, meta["alias"], EXPIRED))
+                elif meta["state"] == ONLINE:
+                    self._set_state(mac, meta, SUSPECT)
+                    changes.append(self._change("update", mac, meta["alias"], SUSPECT))
+            if changes:
+                self._emit_locked(changes)
+
+    def _set_state(self, mac: str, meta: Dict[str, Any], state: str):
+        """Cambia el estado y mantiene los índices (con _lock tomado)."""
+        self._by_state.get(meta["state"], {}).pop(mac, None)
+        meta["state"] = state
+        if state in self._by_state:
+            self._by_state[state][mac] = None
+
+    def _emit_locked(self, changes: List[Dict[str, Any]]):
+        """
+        Numera y publica un lote de cambios. Se llama con _lock tomado, en la misma sección
+        crítica que aplicó los cambios: así el orden de las revisiones es el orden real de
+        los cambios de estado (un barrido y un REPLY concurrentes no pueden cruzarse).
+        El callback solo debe encolar (AppServer._emit_event), nunca volver a Discovery.
+        """
+        self.revision += 1
+        if not self.on_neighbors_diff:
+            return
+        try:
+            self.on_neighbors_diff({"rev": self.revision, "changes": changes})
+        except Exception as e:
+            
+            print(f"[neighbors cb] error: {e}")
 
     #  Utilidades 
+    @staticmethod
+    def _change(op: str, mac: str, alias: str, state: str) -> Dict[str, Any]:
+        return {"op": op, "mac": mac, "alias": alias, "online": state == ONLINE, "state": state}
+
     @staticmethod
     def _parse_alias(payload: str) -> str:
         # payload formato: "alias=Nombre Con Espacios"
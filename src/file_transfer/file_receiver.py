@@ -1,13 +1,18 @@
 import logging
 import os
 import pathlib
+import threading
+import time
 from typing import Dict, Any
 
 from src.core.enums.enums import MessageType
 from src.core.managers.service_threads import ThreadManager
 from src.core.schemas.frame_schemas import FrameSchema
+from src.core.schemas.scheduled_task import ScheduledTask
+from src.file_transfer.helpers.chunk_size import max_chunk_for_mtu
 from src.file_transfer.helpers.get_file_hash import get_file_hash
 from src.file_transfer.helpers.parse_payload import parse_payload
+from src.file_transfer.helpers.progress_aggregator import ProgressAggregator
 from src.file_transfer.schemas.recv_ctx import FileRcvCtxSchema
 
 from src.file_transfer.handlers.ui_events import (
@@ -16,21 +21,126 @@ from src.file_transfer.handlers.ui_events import (
 
 
 class FileReceiver:
+    # Sin ACK diferido pendiente la tarea de flush duerme esto; con ventana 0 anunciada
+    # se revisa cada _WINDOW_POLL_S hasta que el backlog de escritura baje
+    _ACK_IDLE_S = 1.0
+    _WINDOW_POLL_S = 0.01
+
     def __init__(self, service_threads: ThreadManager, base_dir: str) -> None:
         self._service_threads = service_threads
         self.ctx_by_id: Dict[str, FileRcvCtxSchema] = {}
         self.base_dir = os.path.abspath(base_dir)
+        self._progress = ProgressAggregator.from_env()
+
+        # Política de ACK diferido por defecto (el META de cada transferencia puede ajustarla)
+        self.ack_every = max(1, int(os.environ.get("ACK_EVERY", "4")))
+        self.ack_delay_s = max(0.0, float(os.environ.get("ACK_DELAY_MS", "40")) / 1000.0)
+        self._stats = {"transfers": 0, "data_frames": 0, "acks_sent": 0}
+        # Chunks pendientes de escritura que el receptor tolera antes de cerrar la ventana
+        self.rcv_buffer = max(1, int(os.environ.get("RCV_WINDOW", "64")))
 
         os.makedirs(self.base_dir, exist_ok=True)
         self._service_threads.add_message_handler(MessageType.FILE_DATA, self._on_data)
         self._service_threads.add_message_handler(MessageType.FILE_META, self._on_meta)
-
-
-    def _send_ack(self, file_id: str, dst_mac: str, next_needed: int):
-        payload = f"file_id={file_id}\nnext_needed={next_needed}\n".encode("utf-8")
+        # FILE_FIN es compartido con FileSender: lo que no es nuestro sigue al handler anterior
+        self._next_fin = self._service_threads.get_message_handler(MessageType.FILE_FIN)
+        self._service_threads.add_message_handler(MessageType.FILE_FIN, self._on_fin)
+        self._ack_task = ScheduledTask(action=self._flush_delayed_acks, interval=self._ACK_IDLE_S)
+        self._ack_task_lock = threading.Lock()
+        self._service_threads.add_scheduled_task(self._ack_task)
+
+
+    def _send_ack(self, file_id: str, dst_mac: str, next_needed: int, rwnd: int | None = None,
+                  delayed: bool = False):
+        payload = f"file_id={file_id}\nnext_needed={next_needed}\n"
+        if rwnd is not None:
+            payload += f"rwnd={rwnd}\n"
+        if delayed:
+            # Salió por timer, no al llegar el chunk: el emisor no debe medir RTT con él
+            payload += "delayed=1\n"
+        payload = payload.encode("utf-8")
         frame = self._service_threads.file_transfer_handler.get_frame(dst_mac, MessageType.ACK, payload)
         self._service_threads.queue_frame_for_sending(frame)
 
+    def _rwnd(self, ctx: FileRcvCtxSchema) -> int:
+        """Ventana disponible: el buffer del contexto menos las escrituras aún en cola."""
+        return max(0, ctx.rcv_buffer - self._service_threads.io_pool.backlog(ctx.file_id))
+
+    def _ack_now(self, ctx: FileRcvCtxSchema, delayed: bool = False):
+        """ACK acumulativo inmediato; reinicia el contador y el timer de ACK diferido."""
+        ctx.last_rwnd = self._rwnd(ctx)
+        self._send_ack(ctx.file_id, ctx.src_mac, ctx.next_needed, ctx.last_rwnd, delayed)
+        ctx.unacked = 0
+        ctx.ack_due_ts = 0.0
+        ctx.acks_sent += 1
+
+    def _next_ack_deadline(self, ctx: FileRcvCtxSchema, now: float) -> float:
+        """Cuándo necesita ctx la tarea de flush (inf si no la necesita)."""
+        if ctx.finished:
+            return float("inf")
+        deadline = ctx.ack_due_ts or float("inf")
+        if ctx.last_rwnd == 0:
+            deadline = min(deadline, now + self._WINDOW_POLL_S)
+        return deadline
+
+    def _arm_ack_timer(self, ctx: FileRcvCtxSchema):
+        """
+        Adelanta la tarea de flush si ctx necesita un ACK diferido (o un aviso de ventana)
+        antes de la próxima corrida. Llamar sin ctx.lock tomado.
+        """
+        deadline = self._next_ack_deadline(ctx, time.time())
+        with self._ack_task_lock:
+            task = self._ack_task
+            if deadline < task.last_run + task.interval:
+                task.interval = max(0.0, deadline - task.last_run)
+                self._service_threads.wake_scheduler()
+
+    def _flush_delayed_acks(self):
+        """
+        Tarea del scheduler: envía los ACK diferidos cuyo timer venció, y una actualización
+        de ventana si la última anunciada fue 0 y el backlog ya bajó. Se reprograma para
+        el próximo vencimiento; sin nada pendiente no despierta más que cada _ACK_IDLE_S.
+        """
+        now = time.time()
+        with self._ack_task_lock:
+            next_due = now + self._ACK_IDLE_S
+            for ctx in list(self.ctx_by_id.values()):
+                due = ctx.ack_due_ts and now >= ctx.ack_due_ts
+                reopened = ctx.last_rwnd == 0 and self._rwnd(ctx) > 0
+                if due or reopened:
+                    with ctx.lock:
+                        if not ctx.finished:
+                            self._ack_now(ctx, delayed=True)
+                next_due = min(next_due, self._next_ack_deadline(ctx, now))
+            # El scheduler fijó last_run al arrancar esta corrida
+            self._ack_task.interval = max(0.0, next_due - self._ack_task.last_run)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de ACK: cuántos DATA llegaron y cuántos ACK se ahorraron (1 ACK por DATA = 0)."""
+        totals = dict(self._stats)
+        active = []
+        for ctx in list(self.ctx_by_id.values()):
+            totals["data_frames"] += ctx.data_frames
+            totals["acks_sent"] += ctx.acks_sent
+            active.append({
+                "file_id": ctx.file_id,
+                "src": ctx.src_mac,
+                "ack_every": ctx.ack_every,
+                "ack_delay_ms": int(ctx.ack_delay_s * 1000),
+                "data_frames": ctx.data_frames,
+                "acks_sent": ctx.acks_sent,
+                "acks_saved": max(0, ctx.data_frames - ctx.acks_sent),
+                "rwnd": ctx.last_rwnd,
+            })
+        totals["acks_saved"] = max(0, totals["data_frames"] - totals["acks_sent"])
+        totals["active"] = active
+        return totals
+
+    def _account_finished(self, ctx: FileRcvCtxSchema):
+        self._stats["transfers"] += 1
+        self._stats["data_frames"] += ctx.data_frames
+        self._stats["acks_sent"] += ctx.acks_sent
+
     def _send_fin(self, file_id: str, dst_mac: str, status: str, reason: str = ""):
         ctx = self.ctx_by_id.get(file_id)
         if not ctx:
@@ -122,6 +232,17 @@ class FileReceiver:
             emit_error(file_id=file_id, src=frame.src_mac, name=name, rel=rel_path, error="bad_meta_ranges")
             return
 
+        # Chunk negociado: si el DATA no entraría en el MTU local, pedir uno menor
+        max_chunk = max_chunk_for_mtu(
+            self._service_threads.local_mtu, self._service_threads.frame_overhead, file_id, size
+        )
+        if chunk_size > max_chunk:
+            logging.info("[META<-] file_id=%s chunk_size=%d > max_chunk=%d", file_id, chunk_size, max_chunk)
+            payload = f"file_id={file_id}\nmax_chunk={max_chunk}\n".encode("utf-8")
+            frame = self._service_threads.file_transfer_handler.get_frame(frame.src_mac, MessageType.ACK, payload)
+            self._service_threads.queue_frame_for_sending(frame)
+            return
+
         # Destino final
         dest_rel = rel_path if rel_path else name
         dest_path = os.path.normpath(os.path.join(self.base_dir, dest_rel))
@@ -173,9 +294,61 @@ class FileReceiver:
             dest_path=dest_path
         )
         setattr(ctx, "rel", dest_rel)
+        ctx.ack_every, ctx.ack_delay_s = self._ack_policy(kv)
+        ctx.rcv_buffer = self.rcv_buffer
         self.ctx_by_id[file_id] = ctx
 
-        self._send_ack(file_id, frame.src_mac, next_needed=0)
+        ctx.last_rwnd = self._rwnd(ctx)
+        self._send_ack(file_id, frame.src_mac, next_needed=0, rwnd=ctx.last_rwnd)
+
+    # Fin
+    def _on_fin(self, frame: FrameSchema):
+        """
+        FIN de error del emisor (cancelación, timeout): se abandona la recepción. El contexto
+        sale de la tabla ya (no más ACKs ni escrituras); el cierre del descriptor y el borrado
+        del .part van a la cola de I/O del archivo, detrás de las escrituras pendientes.
+        """
+        kv = parse_payload(frame.payload.decode("utf-8"))
+        file_id = kv.get("file_id")
+        ctx = self.ctx_by_id.get(file_id) if file_id else None
+        if not ctx or ctx.src_mac != frame.src_mac or kv.get("status") == "ok":
+            if self._next_fin:
+                self._next_fin(frame)
+            return
+
+        with ctx.lock:
+            if ctx.finished:
+                return
+            ctx.finished = True
+        self.ctx_by_id.pop(file_id, None)
+        reason = kv.get("reason", "") or "error"
+        logging.info("[FIN<-] file_id=%s abortado por el emisor: %s", file_id, reason)
+        self._service_threads.io_pool.submit(file_id, self._discard_file, ctx)
+        emit_error(
+            file_id=file_id, src=ctx.src_mac, name=ctx.name,
+            rel=getattr(ctx, "rel", os.path.basename(ctx.dest_path)), error=reason
+        )
+        self._account_finished(ctx)
+
+    def _discard_file(self, ctx: FileRcvCtxSchema):
+        """Corre en el hilo de I/O del archivo: cierra el descriptor y borra el temporal."""
+        self._close_file(ctx)
+        try:
+            os.remove(ctx.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def _ack_policy(self, kv: Dict[str, Any]) -> tuple[int, float]:
+        """Política de ACK de la transferencia: la que pide el META o la del receptor."""
+        ack_every, ack_delay_s = self.ack_every, self.ack_delay_s
+        try:
+            if kv.get("ack_every"):
+                ack_every = min(64, max(1, int(kv["ack_every"])))
+            if kv.get("ack_delay_ms"):
+                ack_delay_s = min(0.5, max(0.0, int(kv["ack_delay_ms"]) / 1000.0))
+        except ValueError:
+            pass
+        return ack_every, ack_delay_s
 
     # Data
     def _on_data(self, frame: FrameSchema):
@@ -204,41 +377,100 @@ class FileReceiver:
             return
 
         with ctx.lock:
-            with open(ctx.temp_path, "r+b") as f:
-                f.seek(idx * ctx.chunk_size)
-                f.write(data)
+            if ctx.finished:
+                return
+            duplicate = idx in ctx.received
+            if duplicate:
+                # Duplicado: no se reescribe; ACK inmediato (el anterior se perdió)
+                ctx.data_frames += 1
+                self._ack_now(ctx)
+        if duplicate:
+            self._arm_ack_timer(ctx)
+            return
 
-            if idx not in ctx.received:
-                ctx.received.add(idx)
-                while ctx.next_needed in ctx.received:
-                    ctx.next_needed += 1
+        # La escritura va al pool de I/O (cola ordenada por archivo); el dispatcher sigue
+        self._service_threads.io_pool.submit(
+            ctx.file_id, self._write_chunk, ctx, idx, data,
+            on_done=lambda _res, err: self._on_chunk_written(ctx, idx, err),
+        )
 
-            self._send_ack(ctx.file_id, frame.src_mac, ctx.next_needed)
+    def _write_chunk(self, ctx: FileRcvCtxSchema, idx: int, data: bytes):
+        """Corre en el hilo de I/O del archivo: reutiliza un único descriptor abierto."""
+        if ctx.finished:
+            return
+        if ctx.fh is None:
+            ctx.fh = open(ctx.temp_path, "r+b")
+        ctx.fh.seek(idx * ctx.chunk_size)
+        ctx.fh.write(data)
+
+    def _close_file(self, ctx: FileRcvCtxSchema):
+        if ctx.fh is not None:
+            try:
+                ctx.fh.close()
+            finally:
+                ctx.fh = None
+
+    def _on_chunk_written(self, ctx: FileRcvCtxSchema, idx: int, err: BaseException | None):
+        """Callback de fin de escritura (hilo de I/O): ACK, progreso y cierre del archivo."""
+        rel_for_events = getattr(ctx, "rel", os.path.basename(ctx.dest_path))
+        if err is not None:
+            with ctx.lock:
+                if ctx.finished:
+                    return
+                ctx.finished = True
+            self._close_file(ctx)
+            self._send_fin(ctx.file_id, ctx.src_mac, "error", "write_failed")
+            emit_error(file_id=ctx.file_id, src=ctx.src_mac, name=ctx.name, rel=rel_for_events, error="write_failed")
+            self._account_finished(ctx)
+            self.ctx_by_id.pop(ctx.file_id, None)
+            return
+
+        with ctx.lock:
+            if ctx.finished:
+                return
+            prev_next = ctx.next_needed
+            duplicate = not ctx.received.add(idx)
+            if not duplicate and idx == prev_next:
+                ctx.next_needed = ctx.received.first_missing(prev_next)
+            ctx.data_frames += 1
+
+            # ACK inmediato ante duplicado (el ACK previo se perdió), hueco nuevo
+            # (idx fuera de orden), hueco rellenado o transferencia completa
+            gap = idx != prev_next or ctx.next_needed > prev_next + 1
+            complete = ctx.received.full
+            ctx.unacked += 1
+            if duplicate or gap or complete or ctx.unacked >= ctx.ack_every:
+                self._ack_now(ctx)
+            elif not ctx.ack_due_ts:
+                ctx.ack_due_ts = time.time() + ctx.ack_delay_s
             acked = len(ctx.received)
             progress = (acked / ctx.total_chunks) if ctx.total_chunks else 0.0
-
-        rel_for_events = getattr(ctx, "rel", os.path.basename(ctx.dest_path))
-        emit_progress(
-            file_id=ctx.file_id,
-            src=ctx.src_mac,
-            name=ctx.name,
-            rel=rel_for_events,
-            acked=acked,
-            total=ctx.total_chunks,
-            progress=progress
-        )
+        self._arm_ack_timer(ctx)
+
+        if self._progress.should_emit(ctx.file_id, acked, ctx.total_chunks):
+            emit_progress(
+                file_id=ctx.file_id,
+                src=ctx.src_mac,
+                name=ctx.name,
+                rel=rel_for_events,
+                acked=acked,
+                total=ctx.total_chunks,
+                progress=progress
+            )
 
         finished_now = False
         with ctx.lock:
-            if len(ctx.received) >= ctx.total_chunks and not ctx.finished:
+            if complete and not ctx.finished:
                 ctx.finished = True
                 finished_now = True
 
         if finished_now:
+            # Mismo hilo de I/O que las escrituras: todo lo anterior ya está en disco
+            self._close_file(ctx)
             calc = get_file_hash(ctx.temp_path)
             if calc.lower() == ctx.sha256_expected.lower():
                 os.replace(ctx.temp_path, ctx.dest_path)
-                self._send_fin(ctx.file_id, frame.src_mac, "ok")
+                self._send_fin(ctx.file_id, ctx.src_mac, "ok")
                 emit_finished(
                     file_id=ctx.file_id,
                     src=ctx.src_mac,
@@ -247,7 +479,7 @@ class FileReceiver:
                     status="ok"
                 )
             else:
-                self._send_fin(ctx.file_id, frame.src_mac, "error", "hash_mismatch")
+                self._send_fin(ctx.file_id, ctx.src_mac, "error", "hash_mismatch")
                 emit_error(
                     file_id=ctx.file_id,
                     src=ctx.src_mac,
@@ -255,4 +487,5 @@ class FileReceiver:
                     rel=rel_for_events,
                     error="hash_mismatch"
                 )
+            self._account_finished(ctx)
             self.ctx_by_id.pop(ctx.file_id, None)
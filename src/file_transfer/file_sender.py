@@ -1,46 +1,122 @@
 import logging
 import os
 import pathlib
+import threading
 import time
-from src.core.enums.enums import MessageType
+from typing import Callable
+from src.core.enums.enums import FileTxState, MessageType
+from src.core.helpers.bitset import ChunkBitset
 from src.core.managers.service_threads import ThreadManager
 from src.core.schemas.frame_schemas import FrameSchema
+from src.file_transfer.helpers.chunk_size import max_chunk_for_mtu
 from src.file_transfer.helpers.parse_payload import parse_payload
 from src.file_transfer.helpers.get_file_hash import get_file_hash
+from src.file_transfer.helpers.tx_state import set_tx_state
+from src.file_transfer.handlers.ui_events import emit_tx_state
 from src.file_transfer.schemas.send_ctx import FileSendCtxSchema
 
 
 class FileSender:
     def __init__(self, service_threads: ThreadManager, chunk_size: int):
         self.service_threads = service_threads
+        # chunk_size se usa si no hay MTU de camino (MTU_DISCOVERY=0 o el peer no contesta
+        # las sondas); CHUNK_SIZE_MAX (0 = sin tope) acota el tamaño negociado
         self._chunk_size = chunk_size
+        self._mtu_discovery = os.environ.get("MTU_DISCOVERY", "1") != "0"
+        self._chunk_size_max = int(os.environ.get("CHUNK_SIZE_MAX", "0"))
 
         self.service_threads.add_message_handler(MessageType.ACK, self._on_ack)
+        # FILE_FIN lo usan los dos sentidos: los que no son de un envío propio siguen al
+        # handler anterior (el FIN de error que un emisor le manda a FileReceiver)
+        self._next_fin = self.service_threads.get_message_handler(MessageType.FILE_FIN)
         self.service_threads.add_message_handler(MessageType.FILE_FIN, self._on_fin)
 
     def _to_posix_relative(self, path: str, root: str) -> str:
         rel = os.path.relpath(path, root)
         return pathlib.PurePosixPath(rel).as_posix()
 
-    def send_folder(self, folder_path: str, dst_mac: str):
+    def send_folder(
+        self,
+        folder_path: str,
+        dst_mac: str,
+        cancel_event: threading.Event | None = None,
+        on_file_started: Callable[[str, str], None] | None = None,
+        weight: float = 1.0,
+        ack_every: int = 0,
+        ack_delay_ms: int = 0,
+    ):
+        """
+        Envía los archivos de la carpeta de a uno (espera el cierre de cada uno).
+        Bloquea: debe correr fuera del loop del IPC (ver JobManager).
+          - cancel_event: si se activa, cancela el archivo en curso y no sigue.
+          - on_file_started(file_id, rel): se llama apenas arranca cada archivo.
+        """
         folder_path = os.path.abspath(folder_path)
         sent = []
+        cancel_event = cancel_event or threading.Event()
 
         base_for_rel = os.path.dirname(os.path.normpath(folder_path))
 
         for root, _, files in os.walk(folder_path):
             for fname in files:
+                if cancel_event.is_set():
+                    return sent
                 full_path = os.path.join(root, fname)
-                rel_path = self._to_posix_relative(full_path, os.path.dirname(os.path.normpath(folder_path)))
-                file_id = self.send_file(full_path, dst_mac, rel_path)
-                ctx = self.service_threads.get_ctx_by_id(file_id)
-                while ctx and not ctx.finished:
-                    time.sleep(0.05)
-
-                sent.append((file_id, rel_path))
+                rel_path = self._to_posix_relative(full_path, base_for_rel)
+                ctx = self._start_file(
+                    full_path, dst_mac, rel_path,
+                    weight=weight, ack_every=ack_every, ack_delay_ms=ack_delay_ms,
+                )
+                sent.append((ctx.file_id, rel_path))
+                if on_file_started:
+                    on_file_started(ctx.file_id, rel_path)
+                if not self._wait_finished(ctx, cancel_event):
+                    return sent
         return sent
 
-    def send_file(self, path: str, dst_mac: str, rel_path: str | None = None):
+    def send_file_and_wait(
+        self,
+        path: str,
+        dst_mac: str,
+        cancel_event: threading.Event | None = None,
+        on_file_started: Callable[[str], None] | None = None,
+        weight: float = 1.0,
+        ack_every: int = 0,
+        ack_delay_ms: int = 0,
+    ) -> FileSendCtxSchema:
+        """
+        Como send_folder pero de un solo archivo: bloquea hasta el estado terminal
+        (FINISHED o FAILED, también si se canceló) y devuelve el contexto.
+          - on_file_started(file_id): se llama apenas se registra la transferencia.
+        """
+        ctx = self._start_file(path, dst_mac, weight=weight, ack_every=ack_every, ack_delay_ms=ack_delay_ms)
+        if on_file_started:
+            on_file_started(ctx.file_id)
+        self._wait_finished(ctx, cancel_event or threading.Event())
+        return ctx
+
+    def _wait_finished(self, ctx: FileSendCtxSchema, cancel_event: threading.Event) -> bool:
+        """Espera el estado terminal; False si cancel_event la interrumpió (y se canceló)."""
+        while not ctx.finished:
+            if cancel_event.wait(0.05):
+                self.cancel_file(ctx.file_id)
+                return False
+        return True
+
+    def send_file(self, path: str, dst_mac: str, rel_path: str | None = None, weight: float = 1.0,
+                  ack_every: int = 0, ack_delay_ms: int = 0):
+        """
+        Registra la transferencia, envía el META inicial y retorna el file_id de inmediato.
+        (send_file_and_wait espera el final.)
+        `weight` es la parte relativa del enlace que le asigna el TransferScheduler;
+        `ack_every`/`ack_delay_ms` (0 = por defecto) viajan en el META como política de ACK.
+        El handshake sigue en segundo plano: ThreadManager._pump reintenta/expira el META
+        y _on_ack pasa el contexto a SENDING; cada transición se publica con emit_tx_state.
+        """
+        return self._start_file(path, dst_mac, rel_path, weight, ack_every, ack_delay_ms).file_id
+
+    def _start_file(self, path: str, dst_mac: str, rel_path: str | None = None, weight: float = 1.0,
+                    ack_every: int = 0, ack_delay_ms: int = 0) -> FileSendCtxSchema:
         if not os.path.isfile(path):
             print("No se encontró ningún archivo en ", path)
             raise FileNotFoundError(path)
@@ -49,8 +125,9 @@ class FileSender:
         hash_sha256_hex = get_file_hash(path)
         file_name = os.path.basename(path)
 
-        total_chunks = (file_size + self._chunk_size - 1) // self._chunk_size
         file_id = f"{file_name}-{hash_sha256_hex[:12]}"
+        chunk_size = self._chunk_size_for(dst_mac, file_id, file_size)
+        total_chunks = (file_size + chunk_size - 1) // chunk_size
 
         ctx = FileSendCtxSchema(
             file_id=file_id,
@@ -58,41 +135,78 @@ class FileSender:
             path=path,
             size=file_size,
             hash_sha256_hex=hash_sha256_hex,
-            chunk_size=self._chunk_size,
-            total_chunks=total_chunks
+            chunk_size=chunk_size,
+            total_chunks=total_chunks,
+            file_name=file_name,
+            rel_path=rel_path,
+            weight=weight,
+            ack_every=ack_every,
+            ack_delay_ms=ack_delay_ms,
         )
-        self.service_threads.add_ctx_by_id(file_id, ctx)
-
-        # Enviar META inicial
-        self._send_meta(ctx, file_name, rel_path=rel_path)
-
-        # Esperar ACK inicial para evitar DATA antes que META
-        start_wait = time.time()
-        while not ctx.meta_acked and not ctx.finished:
-            time.sleep(0.02)
-            # Reintentar META si nadie responde por 1.5 s
-            if ctx.meta_sent_ts > 0 and (time.time() - ctx.meta_sent_ts) >= 1.5:
-                self._send_meta(ctx, file_name, rel_path=rel_path)
-            if time.time() - start_wait > 30:
-                frame = self.service_threads.file_transfer_handler.get_file_fin_frame(ctx, "error", "meta_timeout")
-                self.service_threads.queue_frame_for_sending(frame)
-                with ctx.lock:
-                    ctx.finished = True
-                break
-
-        return file_id
-
-    def _send_meta(self, ctx: FileSendCtxSchema, file_name: str, rel_path: str | None = None):
+        # Arranque según lo que ya se sabe del enlace (ventana ~ BDP, RTT para el pacing)
+        link = self.service_threads.link_stats
+        ctx.window_size = link.initial_window(dst_mac, chunk_size, default=ctx.window_size)
+        stats = link.get(dst_mac)
+        if stats:
+            ctx.srtt_s = stats.srtt_s
+        ctx.meta_started_ts = time.time()
+
+        # Publicar el contexto antes del META: un ACK rápido (loopback, LAN) ya lo encuentra.
+        # Con el lock tomado el pump no lo ve a medias (meta_sent_ts=0 no reintenta)
+        # y el meta_pending se publica dentro del lock, antes de que un ACK lo pase a sending
+        with ctx.lock:
+            self.service_threads.add_ctx_by_id(file_id, ctx)
+            self._send_meta(ctx)
+            emit_tx_state(
+                file_id=file_id, dst=dst_mac, name=file_name, rel=rel_path,
+                state=ctx.state.value
+            )
+        return ctx
+
+    def _chunk_size_for(self, dst_mac: str, file_id: str, size: int) -> int:
+        """Chunk más grande que entra en el MTU de camino hacia dst_mac (ver PathMtuProber)."""
+        if not self._mtu_discovery:
+            return self._chunk_size
+        mtu = self.service_threads.path_mtu.path_mtu(dst_mac)
+        if mtu <= 0:
+            return self._chunk_size
+        chunk_size = max_chunk_for_mtu(mtu, self.service_threads.frame_overhead, file_id, size)
+        chunk_size = self.service_threads.link_stats.chunk_size(dst_mac, chunk_size)
+        if self._chunk_size_max > 0:
+            chunk_size = min(chunk_size, self._chunk_size_max)
+        return chunk_size
+
+    def _rechunk(self, ctx: FileSendCtxSchema, max_chunk: int):
+        """El receptor pidió chunks más chicos en respuesta al META: rehacer y reenviar META."""
+        ctx.chunk_size = max_chunk
+        ctx.total_chunks = (ctx.size + max_chunk - 1) // max_chunk
+        ctx.acked = ChunkBitset(ctx.total_chunks)
+        logging.info("[META->] file_id=%s renegociado chunk_size=%d", ctx.file_id, max_chunk)
+        self._send_meta(ctx)
+
+    def cancel_file(self, file_id: str, reason: str = "canceled") -> bool:
+        """Aborta una transferencia en curso: FIN de error al receptor y estado FAILED."""
+        ctx = self.service_threads.get_ctx_by_id(file_id)
+        if not ctx or ctx.finished:
+            return False
+        frame = self.service_threads.file_transfer_handler.get_file_fin_frame(ctx, "error", reason)
+        self.service_threads.queue_frame_for_sending(frame)
+        with ctx.lock:
+            ctx.inflight.clear()
+            set_tx_state(ctx, FileTxState.FAILED, reason)
+        return True
+
+    def _send_meta(self, ctx: FileSendCtxSchema):
         frame: FrameSchema = self.service_threads.file_transfer_handler.get_meta_frame(
             ctx=ctx,
-            file_name=file_name,
-            rel_path=rel_path
+            file_name=ctx.file_name,
+            rel_path=ctx.rel_path
         )
         self.service_threads.queue_frame_for_sending(frame)
         logging.debug(
             "[META->] file_id=%s name=%s size=%d chunks=%d chunk_size=%d sha256=%s rel=%r",
-            ctx.file_id, file_name, ctx.size, ctx.total_chunks, ctx.chunk_size,
-            ctx.hash_sha256_hex[:12], rel_path
+            ctx.file_id, ctx.file_name, ctx.size, ctx.total_chunks, ctx.chunk_size,
+            ctx.hash_sha256_hex[:12], ctx.rel_path
         )
         ctx.meta_sent_ts = time.time()
 
@@ -101,23 +215,57 @@ class FileSender:
         kv = parse_payload(payload)
 
         file_id = kv.get("file_id")
-        logging.debug("[ACK<-] file_id=%s next_needed=%s", file_id, kv.get("next_needed"))
+        logging.debug("[ACK<-] file_id=%s next_needed=%s rwnd=%s", file_id, kv.get("next_needed"), kv.get("rwnd"))
         if not file_id:
             return
         ctx = self.service_threads.get_ctx_by_id(file_id)
-        if not ctx or ctx.finished:
+        # Igual que en _on_fin: solo cuenta el ACK del receptor de esta transferencia
+        if not ctx or ctx.finished or ctx.dst_mac != frame.src_mac:
             return
         try:
             next_needed = int(kv.get("next_needed", "0"))
+            rwnd = int(kv["rwnd"]) if "rwnd" in kv else -1
+            max_chunk = int(kv["max_chunk"]) if "max_chunk" in kv else 0
         except ValueError:
             return
+        next_needed = max(0, min(next_needed, ctx.total_chunks))
 
         with ctx.lock:
+            if max_chunk:
+                # Rechazo del META por tamaño de chunk: solo vale antes de mandar datos
+                if not ctx.meta_acked and 0 < max_chunk < ctx.chunk_size:
+                    self._rechunk(ctx, max_chunk)
+                return
+            if rwnd >= 0:
+                ctx.probe_unanswered = 0    # el receptor sigue vivo aunque la ventana siga en 0
+                if ctx.rwnd == 0 and rwnd > 0:
+                    # La ventana reabrió: lo que estaba en vuelo no se perdió, reiniciar timers
+                    now = time.time()
+                    for idx, (_, retries) in list(ctx.inflight.items()):
+                        ctx.inflight[idx] = (now, retries)
+                    ctx.probe_ts = 0.0
+                    ctx.probe_interval_s = 0.25
+                ctx.rwnd = rwnd
             if not ctx.meta_acked and next_needed == 0:
                 ctx.meta_acked = True
+                set_tx_state(ctx, FileTxState.SENDING)
+            # ACK acumulativo: solo se marca lo nuevo, no todo el prefijo (costo por ACK
+            # proporcional a lo que avanza, no al tamaño del archivo)
+            newly_acked = ctx.acked.set_range(ctx.last_acked + 1, next_needed)
+            link = self.service_threads.link_stats
+            if newly_acked:
+                # Bytes reales del rango: el último chunk suele ser más corto que chunk_size
+                prev_bytes = min((ctx.last_acked + 1) * ctx.chunk_size, ctx.size)
+                link.on_acked(ctx.dst_mac, min(next_needed * ctx.chunk_size, ctx.size) - prev_bytes)
+            # Muestra de RTT con el chunk más nuevo que confirma este ACK (Karn: sin reintentos).
+            # Un ACK diferido incluye la espera adrede del receptor (hasta ack_delay_ms): no se mide
+            sent = ctx.inflight.get(next_needed - 1)
+            if sent and sent[1] == 0 and kv.get("delayed") != "1":
+                sample = time.time() - sent[0]
+                ctx.srtt_s = sample if ctx.srtt_s <= 0 else 0.875 * ctx.srtt_s + 0.125 * sample
+                link.on_rtt(ctx.dst_mac, sample)
             for idx in list(ctx.inflight.keys()):
                 if idx < next_needed:
-                    ctx.acked.add(idx)
                     ctx.inflight.pop(idx, None)
             ctx.last_acked = max(ctx.last_acked, next_needed - 1)
             logging.debug("[ACK<-] updated %s", ctx.debug_snapshot())
@@ -131,12 +279,18 @@ class FileSender:
         if not file_id:
             return
         ctx = self.service_threads.get_ctx_by_id(file_id)
-        if not ctx:
+        if not ctx or ctx.dst_mac != frame.src_mac:
+            if self._next_fin:
+                self._next_fin(frame)
             return
 
         logging.debug("[FIN<-] updated %s", ctx.debug_snapshot())
         with ctx.lock:
-            ctx.finished = True
+            if status == "ok":
+                set_tx_state(ctx, FileTxState.FINISHED)
+            else:
+                reason = kv.get("reason", "") or "error"
+                set_tx_state(ctx, FileTxState.FAILED, reason)
         if status != "ok":
             reason = kv.get("reason", "")
             print(f"FIN error para {file_id}: {reason}")
@@ -1,4 +1,5 @@
 import base64
+import threading
 
 from src.prepare.network_config import get_ether_type
 from src.core.enums.enums import MessageType
@@ -9,6 +10,7 @@ from src.file_transfer.schemas.send_ctx import FileSendCtxSchema
 class FileTransferHandler:
     def __init__(self, src_mac: str) -> None:
         self._seq = 0
+        self._seq_lock = threading.Lock()   # lo usan pump, dispatchers e hilos de I/O
         self._src_mac = src_mac 
 
     def _kv_bytes(self, **kwargs):
@@ -44,7 +46,9 @@ class FileTransferHandler:
         return self.get_frame(ctx.dst_mac, MessageType.FILE_DATA, payload)
         
     def get_frame(self, dst_mac: str, msg_type: MessageType, payload: bytes) -> FrameSchema:
-        self._seq = (self._seq + 1) & 0xFFFF
+        with self._seq_lock:
+            self._seq = (self._seq + 1) & 0xFFFF
+            seq = self._seq
 
         return FrameSchema(
             dst_mac=dst_mac,
@@ -53,7 +57,7 @@ class FileTransferHandler:
             header=HeaderSchema(
                 message_type=msg_type,
                 payload_len=len(payload),
-                sequence=self._seq 
+                sequence=seq
             ),
             payload=payload
         )
@@ -69,6 +73,10 @@ class FileTransferHandler:
         )
         if rel_path:
             kv["path"] = rel_path
+        if ctx.ack_every > 0:
+            kv["ack_every"] = ctx.ack_every
+        if ctx.ack_delay_ms > 0:
+            kv["ack_delay_ms"] = ctx.ack_delay_ms
         payload = self._kv_bytes(**kv)
         return self.get_frame(ctx.dst_mac, MessageType.FILE_META, payload)
     
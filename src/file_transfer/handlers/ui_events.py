@@ -53,3 +53,24 @@ def emit_error(*, file_id: str, src: str | None, name: str | None, rel: str | No
             _sink_error({"file_id": file_id, "src": src, "name": name, "rel": rel, "error": error})
         except Exception:
             pass
+
+
+#  TX: cambios de estado de la máquina META -> DATA -> FIN 
+_sink_tx_state: Optional[Callable[[dict], None]] = None
+
+
+def set_tx_sinks(*, on_state: Callable[[dict], None] | None = None):
+    """Registra el callback para los cambios de estado de transferencias salientes."""
+    global _sink_tx_state
+    _sink_tx_state = on_state
+
+
+def emit_tx_state(*, file_id: str, dst: str, name: str, rel: str | None, state: str, reason: str = ""):
+    if _sink_tx_state:
+        try:
+            _sink_tx_state({
+                "file_id": file_id, "dst": dst, "name": name, "rel": rel,
+                "state": state, "reason": reason
+            })
+        except Exception:
+            pass
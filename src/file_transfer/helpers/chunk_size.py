@@ -0,0 +1,12 @@
+# Ningún chunk negociado baja de esto (un MTU absurdo no debe dejar chunks de pocos bytes)
+MIN_CHUNK_SIZE = 256
+
+
+def max_chunk_for_mtu(mtu: int, frame_overhead: int, file_id: str, size: int) -> int:
+    """
+    Chunk más grande cuyo FILE_DATA entra en `mtu` (payload Ethernet):
+    mtu - (header del protocolo + sobre de seguridad) - cabecera key=value del DATA.
+    La cabecera se mide con idx/total = size, cota superior de sus dígitos.
+    """
+    data_header = len(f"file_id={file_id}\nidx={size}\ntotal={size}\n\n".encode("utf-8"))
+    return max(MIN_CHUNK_SIZE, mtu - frame_overhead - data_header)
@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class ProgressAggregator:
+    """
+    Coalesce los eventos de progreso por transferencia:
+      - como mucho `max_rate_hz` eventos por segundo (0 = sin límite de tasa),
+      - y/o solo cuando el avance creció al menos `min_step` (fracción 0..1; 0 = cualquier avance),
+      - nunca repite un valor ya publicado, y el estado final siempre se publica.
+    """
+    def __init__(self, max_rate_hz: float = 4.0, min_step: float = 0.0):
+        self.min_interval = (1.0 / max_rate_hz) if max_rate_hz > 0 else 0.0
+        self.min_step = max(0.0, min_step)
+        # key -> (ts último evento, acked publicado, progreso publicado)
+        self._last: Dict[str, Tuple[float, int, float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProgressAggregator":
+        return cls(
+            max_rate_hz=float(os.environ.get("PROGRESS_MAX_HZ", "4")),
+            min_step=float(os.environ.get("PROGRESS_STEP", "0")),
+        )
+
+    def should_emit(self, key: str, acked: int, total: int, *, final: bool = False) -> bool:
+        progress = (acked / total) if total else 1.0
+        now = time.monotonic()
+        with self._lock:
+            if final or (total and acked >= total):
+                self._last.pop(key, None)
+                return True
+
+            last = self._last.get(key)
+            if last is not None:
+                last_ts, last_acked, last_progress = last
+                if acked == last_acked:
+                    return False
+                if now - last_ts < self.min_interval:
+                    return False
+                if self.min_step and progress - last_progress < self.min_step:
+                    return False
+
+            self._last[key] = (now, acked, progress)
+            return True
+
+    def forget(self, key: str):
+        with self._lock:
+            self._last.pop(key, None)
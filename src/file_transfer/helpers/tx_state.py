@@ -0,0 +1,33 @@
+import logging
+
+from src.core.enums.enums import FileTxState
+from src.file_transfer.handlers.ui_events import emit_tx_state
+from src.file_transfer.schemas.send_ctx import FileSendCtxSchema
+
+
+def set_tx_state(ctx: FileSendCtxSchema, state: FileTxState, reason: str = "") -> bool:
+    """
+    Mueve la transferencia saliente a `state` y publica el evento.
+    Los estados terminales (FINISHED/FAILED) marcan ctx.finished y no se abandonan.
+    Devuelve True si hubo transición.
+    """
+    if ctx.state == state or ctx.state in (FileTxState.FINISHED, FileTxState.FAILED):
+        return False
+
+    prev = ctx.state
+    ctx.state = state
+    if reason:
+        ctx.error = reason
+    if state in (FileTxState.FINISHED, FileTxState.FAILED):
+        ctx.finished = True
+
+    logging.debug("[TX-STATE] file_id=%s %s -> %s %s", ctx.file_id, prev.value, state.value, reason)
+    emit_tx_state(
+        file_id=ctx.file_id,
+        dst=ctx.dst_mac,
+        name=ctx.file_name,
+        rel=ctx.rel_path,
+        state=state.value,
+        reason=reason,
+    )
+    return True
@@ -1,7 +1,9 @@
 from dataclasses import dataclass, field
-from typing import Set
+from typing import BinaryIO, Optional
 import threading, os, tempfile
 
+from src.core.helpers.bitset import ChunkBitset
+
 @dataclass
 class FileRcvCtxSchema:
     file_id: str
@@ -14,11 +16,29 @@ class FileRcvCtxSchema:
     total_chunks: int
     temp_path: str               # ruta al archivo temporal
     dest_path: str
-    received: Set[int] = field(default_factory=set)
+    received: ChunkBitset = field(default=None)    # se dimensiona con total_chunks
     next_needed: int = 0
     finished: bool = False
+
+    # ACK diferido/acumulativo: se confirma cada ack_every chunks o tras ack_delay_s
+    ack_every: int = 4
+    ack_delay_s: float = 0.04
+    unacked: int = 0             # DATA recibidos desde el último ACK
+    ack_due_ts: float = 0.0      # vencimiento del timer de ACK (0 = sin ACK pendiente)
+    data_frames: int = 0
+    acks_sent: int = 0
+
+    # Ventana anunciada (rwnd): chunks que el receptor acepta según su backlog de escritura
+    rcv_buffer: int = 64
+    last_rwnd: int = -1
+
+    fh: Optional[BinaryIO] = field(default=None, repr=False)   # abierto por el hilo de I/O
     lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
+    def __post_init__(self):
+        if self.received is None:
+            self.received = ChunkBitset(self.total_chunks)
+
 
 
 def debug_snapshot(self) -> str:
@@ -1,6 +1,9 @@
 from dataclasses import dataclass, field
 import threading
-from typing import Dict, Set, Tuple
+from typing import Dict, Tuple
+
+from src.core.enums.enums import FileTxState
+from src.core.helpers.bitset import ChunkBitset
 
 @dataclass
 class FileSendCtxSchema:
@@ -11,32 +14,62 @@ class FileSendCtxSchema:
     hash_sha256_hex: str
     chunk_size: int
     total_chunks: int
+    file_name: str = ""
+    rel_path: str | None = None
 
     # send control
     window_size: int = 16  
+    weight: float = 1.0             # peso en el reparto DRR entre transferencias
+    ack_every: int = 0              # política de ACK pedida al receptor (0 = la suya por defecto)
+    ack_delay_ms: int = 0
+    rwnd: int = -1                  # ventana anunciada por el receptor (-1 = sin anunciar)
+    probe_ts: float = 0.0           # último sondeo de ventana cero
+    probe_interval_s: float = 0.25
+    probe_unanswered: int = 0       # sondeos sin ACK; al llegar a max_retries la transferencia falla
     timeout_s: float = 0.6
+    srtt_s: float = 0.0             # RTT suavizado de los ACK (0 = sin muestras); alimenta el pacing
     max_retries: int = 10
     next_to_send: int = 0
     last_acked: int = -1
     inflight: Dict[int, Tuple[float, int]] = field(default_factory=dict)
-    acked: Set[int] = field(default_factory=set)
+    acked: ChunkBitset = field(default=None)       # se dimensiona con total_chunks
     finished: bool = False
     meta_acked: bool = False
     meta_sent_ts: float = 0.0
 
+    # handshake META (lo conduce ThreadManager._pump y el handler de ACK)
+    state: FileTxState = FileTxState.META_PENDING
+    error: str = ""
+    meta_started_ts: float = 0.0
+    meta_retry_s: float = 1.5
+    meta_timeout_s: float = 30.0
+
     lock: threading.Lock = field(default_factory=threading.Lock, repr=False) #mutex
 
+    def __post_init__(self):
+        if self.acked is None:
+            self.acked = ChunkBitset(self.total_chunks)
+
+
 
+    @property
+    def send_window(self) -> int:
+        """Límite efectivo de chunks en vuelo: min(ventana propia, rwnd del receptor)."""
+        return self.window_size if self.rwnd < 0 else min(self.window_size, self.rwnd)
 
     def debug_snapshot(self) -> str:
         inflight = sorted(self.inflight.keys())
         return (
             f"[SENDCTX id={self.file_id}] "
+            f"state={self.state.value} "
             f"next_to_send={self.next_to_send} "
             f"last_acked={self.last_acked} "
             f"inflight={inflight} "
             f"acked_count={len(self.acked)}/{self.total_chunks} "
             f"win={self.window_size} "
+            f"rwnd={self.rwnd} "
+            f"srtt={self.srtt_s:.3f}s "
+            f"weight={self.weight} "
             f"timeout={self.timeout_s}s "
             f"retries={[self.inflight[i][1] for i in inflight]}"
     )
@@ -1,15 +1,18 @@
 import logging
 import time
-from typing import Callable, Dict, Iterable, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 from src.core.enums.enums import MessageType
 from src.core.managers.service_threads import ThreadManager
 from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema
 from src.prepare.network_config import get_ether_type
 
 class Messaging:
-    def __init__(self, threads: ThreadManager, neighbors_ref: Dict[str, Dict],alias: str):
+    def __init__(self, threads: ThreadManager, neighbors_ref: Dict[str, Dict],alias: str,
+                 active_peers: Optional[Callable[[], List[str]]] = None):
         self.threads = threads
         self.neighbors = neighbors_ref
+        # Consulta indexada de vecinos vivos (Discovery.active_peers); sin ella se filtra por last_seen
+        self._active_peers = active_peers
         self._seq = 0
         self._on_message: Optional[Callable[[FrameSchema, str, bytes], None]] = None
         self._attached = False
@@ -49,6 +52,9 @@ class Messaging:
             self.send_to_mac(mac, payload)
 
     def send_to_all_neighbors(self, payload: bytes, only_active_since: Optional[float] = None):
+        if only_active_since is None and self._active_peers is not None:
+            self.send_to_macs(self._active_peers(), payload)
+            return
         now = time.time()
         # snapshot por concurrencia
         for mac, meta in list(self.neighbors.items()):
@@ -56,6 +56,17 @@ def get_interface() -> str:
     # 3) Fallback común en contenedores con network_mode: host
     return "eth0"
 
+DEFAULT_MTU = 1500
+
+def get_interface_mtu(ifname: str | None) -> int:
+    """MTU de la interfaz según /sys/class/net/<if>/mtu (DEFAULT_MTU si no se puede leer)."""
+    if not ifname:
+        return DEFAULT_MTU
+    try:
+        return int((pathlib.Path("/sys/class/net")/ifname/"mtu").read_text().strip())
+    except Exception:
+        return DEFAULT_MTU
+
 def get_alias() -> str:
     # Prioriza envs; cae al hostname si no hay
     return (
@@ -68,5 +79,6 @@ def get_runtime_config() -> dict:
     return {
         "interface": get_interface(),     
         "ethertype": get_ether_type(),    
+        "mtu": get_interface_mtu(get_interface()),
         "alias": get_alias(),
     }
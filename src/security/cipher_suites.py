@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+from src.security.security_handler import SecurityHandler
+
+# keystream(k_enc, nonce, nbytes) -> bytes
+KeystreamFn = Callable[[bytes, bytes, int], bytes]
+# tag(k_mac, data, tag_len) -> bytes
+TagFn = Callable[[bytes, bytes, int], bytes]
+
+# Most preferred first: fastest measured suite (see benchmarks/cipher_bench.py)
+DEFAULT_PREFERENCE = (3, 2, 1)
+
+
+@dataclass(frozen=True)
+class CipherSuite:
+    """Envelope profile, identified on the wire by the version byte (without SESSION_FLAG)."""
+    version: int
+    name: str
+    keystream: KeystreamFn
+    tag: TagFn
+    binary_aad: bool        # packed header AAD (aad_binary) instead of the v1 text AAD
+    bind_version: bool      # version byte is part of the MAC input
+
+
+def hmac_sha256_tag(k_mac: bytes, data: bytes, tag_len: int) -> bytes:
+    return hmac.digest(k_mac, data, "sha256")[:tag_len]
+
+
+def blake2b_tag(k_mac: bytes, data: bytes, tag_len: int) -> bytes:
+    # Keyed BLAKE2b is a MAC on its own (no HMAC construction needed), one pass over data
+    return hashlib.blake2b(data, key=k_mac, digest_size=tag_len).digest()
+
+
+def build_suites(handler: SecurityHandler) -> Dict[int, CipherSuite]:
+    """All suites this build knows, by version byte."""
+    suites = (
+        CipherSuite(1, "hmac-sha256", handler.keystream, hmac_sha256_tag, binary_aad=False, bind_version=False),
+        CipherSuite(2, "shake256-hmac-sha256", handler.keystream_xof, hmac_sha256_tag, binary_aad=True, bind_version=True),
+        CipherSuite(3, "shake256-blake2b", handler.keystream_xof, blake2b_tag, binary_aad=True, bind_version=True),
+    )
+    return {suite.version: suite for suite in suites}
+
+
+def parse_preference(spec: str, known: Iterable[int]) -> tuple:
+    """'3,2,1' -> (3, 2, 1), keeping only known versions; raises ValueError if none is left."""
+    known = set(known)
+    out = []
+    for part in spec.split(","):
+        part = part.strip()
+        if part and int(part) in known and int(part) not in out:
+            out.append(int(part))
+    if not out:
+        raise ValueError(f"No known cipher suite in {spec!r}")
+    return tuple(out)
+
+
+def negotiate(offered: Iterable[int], preference: Sequence[int]) -> Optional[int]:
+    """First suite in our preference order that the peer also offered."""
+    offered = set(offered)
+    for version in preference:
+        if version in offered:
+            return version
+    return None
+
+
+class SuiteMeter:
+    """
+    Per-peer crypto accounting: frames, payload bytes and seconds spent in
+    protect/accept, so throughput can be reported per peer and suite.
+    """
+    def __init__(self):
+        self._peers: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, mac: str, direction: str, suite: CipherSuite, nbytes: int, seconds: float):
+        with self._lock:
+            peer = self._peers.get(mac)
+            if peer is None:
+                peer = self._peers[mac] = {
+                    "suite": suite.name,
+                    "tx_frames": 0, "tx_bytes": 0, "tx_s": 0.0,
+                    "rx_frames": 0, "rx_bytes": 0, "rx_s": 0.0,
+                }
+            peer["suite"] = suite.name
+            peer[direction + "_frames"] += 1
+            peer[direction + "_bytes"] += nbytes
+            peer[direction + "_s"] += seconds
+            peer["updated_ts"] = time.time()
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            peers = {mac: dict(p) for mac, p in self._peers.items()}
+        now = time.time()
+        out = {}
+        for mac, p in peers.items():
+            out[mac] = {
+                "suite": p["suite"],
+                "tx_frames": p["tx_frames"],
+                "rx_frames": p["rx_frames"],
+                # MB/s of crypto work only (time inside protect/accept), not link throughput
+                "tx_MBps": round(p["tx_bytes"] / p["tx_s"] / 1e6, 2) if p["tx_s"] else None,
+                "rx_MBps": round(p["rx_bytes"] / p["rx_s"] / 1e6, 2) if p["rx_s"] else None,
+                "age_s": round(now - p["updated_ts"], 1),
+            }
+        return out
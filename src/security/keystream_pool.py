@@ -0,0 +1,113 @@
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from src.security.session import SessionKeys, SessionStore
+
+# generator(keys, nonce, nbytes) -> keystream with the session's negotiated suite
+KeystreamFn = Callable[[SessionKeys, bytes, int], bytes]
+
+
+class KeystreamPool:
+    """
+    Precomputes keystream blocks for active tx sessions on a worker thread.
+
+    With counter nonces the keystream of the next frames is known before their payload:
+    the worker reserves counters from each session and keeps up to `depth` blocks per
+    session and size class, so protect_outgoing only does the XOR and the MAC.
+    Keystreams are prefix-stable (a shorter request is a prefix of a longer one), so a
+    block serves any payload up to its size; larger payloads fall back to inline.
+
+    Two size classes: `small_bytes` blocks for control frames (ACK, FIN, chat) and
+    `block_bytes` (MTU) blocks for data, so an ACK does not burn a full-MTU keystream.
+    A reserved counter that falls more than `max_lag` behind the session (its class
+    went unused for a while) is discarded rather than sent under the receiver's
+    replay window.
+    """
+    def __init__(self, sessions: SessionStore, generator: KeystreamFn,
+                 block_bytes: int = 1500, depth: int = 32, small_bytes: int = 128):
+        self._sessions = sessions
+        self._generator = generator
+        self.block_bytes = block_bytes
+        self.small_bytes = small_bytes
+        self.depth = depth
+        # Half the receiver's replay window (assumed the same size as ours, default 1024)
+        self.max_lag = max(1, (sessions.replay_window or 1024) // 2)
+        # (sid, small) -> [(keys, counter, nonce, keystream)]
+        self._pools: Dict[Tuple[bytes, bool], Deque[Tuple[SessionKeys, int, bytes, bytes]]] = {}
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def start(self):
+        if self._thread or self.depth <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._fill_loop, name="keystream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def take(self, keys: SessionKeys, nbytes: int) -> Optional[Tuple[bytes, bytes]]:
+        """
+        (nonce, keystream) precomputed for `keys`, or None if the pool has nothing usable.
+        Called with the session lock held (keys.counter is stable).
+        """
+        pool = self._pools.get((keys.sid, nbytes <= self.small_bytes))
+        if nbytes > self.block_bytes or not pool:
+            self.misses += 1
+            self._wakeup.set()
+            return None
+        self._wakeup.set()
+        while True:
+            try:
+                owner, counter, nonce, keystream = pool.popleft()
+            except IndexError:
+                self.misses += 1
+                return None
+            if owner is not keys:
+                self.misses += 1
+                return None
+            if keys.counter - counter <= self.max_lag:
+                break
+            self.stale += 1
+        self.hits += 1
+        return nonce, keystream[:nbytes]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "pooled": sum(len(p) for p in list(self._pools.values())),
+        }
+
+    def _fill_loop(self):
+        logging.info("[Security] Keystream pool started (depth=%d, blocks=%d/%d)",
+                     self.depth, self.small_bytes, self.block_bytes)
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            with self._sessions.lock:
+                active = self._sessions.active_tx()
+            live = {keys.sid for keys in active}
+            for key in [key for key in self._pools if key[0] not in live]:
+                self._pools.pop(key, None)    # session rekeyed or expired
+
+            for keys in active:
+                for small, nbytes in ((True, self.small_bytes), (False, self.block_bytes)):
+                    pool = self._pools.setdefault((keys.sid, small), deque())
+                    while len(pool) < self.depth and not self._stop.is_set():
+                        with self._sessions.lock:
+                            counter = keys.counter
+                            nonce = keys.next_nonce()
+                        pool.append((keys, counter, nonce, self._generator(keys, nonce, nbytes)))
+            self._wakeup.wait(0.1)
@@ -0,0 +1,55 @@
+import threading
+
+
+class ReplayWindow:
+    """
+    Sliding anti-replay window over 64-bit frame counters (RFC 4303 style).
+
+    `top` is the highest counter accepted so far; bit i of `bitmap` marks top - i as
+    seen. Counters above top are new, counters older than `size` are rejected outright.
+
+    check() is the cheap pre-filter run before any MAC work and does not modify state.
+    accept() runs after the tag verified and records the counter; it re-checks under the
+    lock because several crypto workers may verify frames of the same session at once.
+    """
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.top = -1
+        self.bitmap = 0
+        self._mask = (1 << size) - 1
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.too_old = 0
+
+    def check(self, counter: int) -> bool:
+        if counter > self.top:
+            return True
+        offset = self.top - counter
+        if offset >= self.size:
+            self.too_old += 1
+            return False
+        if (self.bitmap >> offset) & 1:
+            self.duplicates += 1
+            return False
+        return True
+
+    def accept(self, counter: int) -> bool:
+        with self._lock:
+            if counter > self.top:
+                shift = counter - self.top
+                self.bitmap = ((self.bitmap << shift) | 1) & self._mask if shift < self.size else 1
+                self.top = counter
+                return True
+            offset = self.top - counter
+            if offset >= self.size:
+                self.too_old += 1
+                return False
+            bit = 1 << offset
+            if self.bitmap & bit:
+                self.duplicates += 1
+                return False
+            self.bitmap |= bit
+            return True
+
+    def stats(self) -> dict:
+        return {"top": self.top, "duplicates": self.duplicates, "too_old": self.too_old}
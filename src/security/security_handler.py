@@ -1,9 +1,18 @@
 import hashlib
 import hmac
 import struct
+from functools import lru_cache
 
 from src.core.schemas.frame_schemas import FrameSchema
 
+# dst(6) src(6) ethertype message_type sequence, same byte order as the wire headers
+_AAD_STRUCT = struct.Struct("!6s6sHHI")
+
+
+@lru_cache(maxsize=1024)
+def _mac_bytes(mac: str) -> bytes:
+    return bytes.fromhex(mac.replace(":", ""))
+
 
 class SecurityHandler:
     def __init__(self) -> None:
@@ -20,11 +29,30 @@ class SecurityHandler:
             counter += 1
         return bytes(out[:nbytes])
 
+    def keystream_xof(self, k_enc: bytes, nonce: bytes, nbytes: int) -> bytes:
+        """Keystream from a single SHAKE-256 call over (key_enc || nonce); output length is free."""
+        return hashlib.shake_256(k_enc + nonce).digest(nbytes)
+
+    @staticmethod
+    def xor(data: bytes, keystream: bytes) -> bytes:
+        """XORs two equal-length buffers as big integers (one C-level operation, no per-byte loop)."""
+        n = len(data)
+        if n == 0:
+            return b""
+        return (int.from_bytes(data, "little") ^ int.from_bytes(keystream[:n], "little")).to_bytes(n, "little")
+
     def aad_for(self, frame: FrameSchema) -> bytes:
         """Builds Additional Authenticated Data from frame headers to protect non-encrypted header fields."""
         aad = f"{frame.src_mac}|{frame.dst_mac}|{frame.ethertype}|{frame.header.message_type}|{frame.header.sequence}"
         return aad.encode("utf-8")
 
+    def aad_binary(self, frame: FrameSchema) -> bytes:
+        """Fixed 20-byte AAD packed from the header fields as they appear on the wire."""
+        return _AAD_STRUCT.pack(
+            _mac_bytes(frame.dst_mac), _mac_bytes(frame.src_mac), frame.ethertype,
+            frame.header.message_type.value, frame.header.sequence,
+        )
+
     def _hkdf_extract(self, nonce: bytes, preshared_key: bytes):
         """HKDF-Extract step: mixes the PSK with a salt (nonce) to produce a pseudorandom key (PRK)."""
         return hmac.new(nonce, preshared_key, hashlib.sha256).digest()
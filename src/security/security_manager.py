@@ -1,12 +1,29 @@
-
-
-
 import hashlib
 import hmac
+import logging
+import os
 import secrets
+import time
+from typing import Callable, Optional, Tuple
+
 from src.core.enums.enums import MessageType
 from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema
+from src.file_transfer.helpers.parse_payload import parse_payload
+from src.security.cipher_suites import (
+    DEFAULT_PREFERENCE,
+    CipherSuite,
+    SuiteMeter,
+    build_suites,
+    negotiate,
+    parse_preference,
+)
+from src.security.keystream_pool import KeystreamPool
 from src.security.security_handler import SecurityHandler
+from src.security.session import PendingHello, SessionKeys, SessionStore
+
+BROADCAST_MAC = "ff:ff:ff:ff:ff:ff"
+# Version byte flag: the nonce is sid(4) || counter(8) of a peer session, not random
+SESSION_FLAG = 0x80
 
 
 class SecurityManager:
@@ -15,40 +32,124 @@ class SecurityManager:
         self.handler = sec_handler
 
         self._nonce_len = 12
-        self._version = 1
         self._tag_len = 16
+        # Envelope version byte -> cipher suite (see cipher_suites.py). SEC_SUITES lists
+        # the suites this node accepts, most preferred first; sessions use the best one
+        # both peers share (negotiated in SEC_HELLO). Per-frame PSK traffic (broadcast,
+        # before a session is up) uses SEC_CIPHER_VERSION, which every peer must accept.
+        known = build_suites(self.handler)
+        self.preference = parse_preference(
+            os.environ.get("SEC_SUITES", ",".join(map(str, DEFAULT_PREFERENCE))), known
+        )
+        self.suites = {v: known[v] for v in self.preference}
+        self._version = int(os.environ.get("SEC_CIPHER_VERSION", "2"))
+        if self._version not in self.suites:
+            raise ValueError(f"SEC_CIPHER_VERSION {self._version} is not in SEC_SUITES")
+        self.meter = SuiteMeter()
+
+        # Peer sessions: keys derived once per direction via SEC_HELLO, counter nonces.
+        # Until a session is up (or for broadcast) frames use per-frame HKDF keys.
+        self.sessions = SessionStore(
+            ttl_s=float(os.environ.get("SEC_SESSION_TTL_S", "3600")),
+            rekey_frames=int(os.environ.get("SEC_REKEY_FRAMES", str(1 << 20))),
+            replay_window=int(os.environ.get("SEC_REPLAY_WINDOW", "1024")),
+        )
+        self._sessions_enabled = os.environ.get("SEC_SESSIONS", "1") != "0"
+        self._hello_retry_s = 5.0
+        # Consecutive tag failures on a known sid before asking the sender to re-handshake
+        self._auth_fail_reset = 8
+        self._reset_sent: dict[str, float] = {}
+        self._send: Optional[Callable[[FrameSchema], None]] = None
+        # Keystream for upcoming session frames, precomputed off the send path (0 disables)
+        self.keystream_pool = KeystreamPool(
+            self.sessions, lambda keys, nonce, nbytes: self.suites[keys.suite].keystream(keys.k_enc, nonce, nbytes),
+            depth=int(os.environ.get("SEC_KS_POOL", "32")),
+        )
+
+    def bind_sender(self, send: Callable[[FrameSchema], None]):
+        """Hook used to queue handshake frames (ThreadManager.queue_frame_for_sending)."""
+        self._send = send
+
+    def start_keystream_pool(self, block_bytes: int):
+        """Starts the precompute worker; block_bytes should cover the largest payload (MTU)."""
+        self.keystream_pool.block_bytes = block_bytes
+        self.keystream_pool.start()
+
+    def stop_keystream_pool(self):
+        self.keystream_pool.stop()
+
+    def _mac_input(self, suite: CipherSuite, version: int, frame: FrameSchema, nonce: bytes, ciphertext: bytes) -> bytes:
+        # v1 left the version byte unauthenticated and used the text AAD
+        aad = self.handler.aad_binary(frame) if suite.binary_aad else self.handler.aad_for(frame)
+        prefix = bytes([version]) if suite.bind_version else b""
+        return prefix + aad + nonce + ciphertext
+
+    def crypto_stats(self) -> dict:
+        """Accepted suites, per-frame default and, per peer, session suite and crypto MB/s."""
+        with self.sessions.lock:
+            sessions = self.sessions.snapshot()
+            replay = self.sessions.replay_stats()
+        peers = self.meter.snapshot()
+        for mac, sess in sessions.items():
+            peers.setdefault(mac, {})["session_suite"] = self.suites[sess["suite"]].name
+        for mac, drops in replay.items():
+            peers.setdefault(mac, {})["replay_dropped"] = drops
+        return {
+            "suites": [self.suites[v].name for v in self.preference],
+            "default": self.suites[self._version].name,
+            "peers": peers,
+        }
+
+    @property
+    def authenticated_types(self) -> frozenset:
+        """Message types whose integrity is covered by the envelope tag."""
+        return frozenset(t for t in MessageType if self._should_protect(t))
+
+    @property
+    def overhead(self) -> int:
+        """Bytes the envelope adds to a payload: version + nonce + tag."""
+        return 1 + self._nonce_len + self._tag_len
 
     def _should_protect(self, message_type: MessageType) -> bool:
         return message_type not in (
             MessageType.DISCOVER_REQUEST,
             MessageType.DISCOVER_REPLY,
+            MessageType.SEC_HELLO,
         )
     
     def protect_outgoing(self, frame: FrameSchema) -> FrameSchema:
         """Encrypts and authenticates an outgoing frame."""
         if not self._should_protect(frame.header.message_type):
             return frame
-        
-        ## Generate a random nonce (unique per frame)
-        nonce = secrets.token_bytes(self._nonce_len)
 
-        # Derive encryption and authentication keys from the PSK and nonce
-        key_enc = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"enc", 32)
-        key_mac = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"mac", 32)
+        started = time.perf_counter()
+        keystream = None
+        session = self._tx_session(frame)
+        if session:
+            keys, nonce, keystream = session
+            suite = self.suites[keys.suite]
+            version, key_enc, key_mac = suite.version | SESSION_FLAG, keys.k_enc, keys.k_mac
+        else:
+            ## Generate a random nonce (unique per frame)
+            nonce = secrets.token_bytes(self._nonce_len)
 
-        # Prepare additional authenticated data (AAD)
-        aad = self.handler.aad_for(frame)
+            # Derive encryption and authentication keys from the PSK and nonce
+            suite = self.suites[self._version]
+            version = suite.version
+            key_enc = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"enc", 32)
+            key_mac = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"mac", 32)
 
         # Encrypt payload using XOR-based stream cipher
         payload = frame.payload
-        keystream = self.handler.keystream(key_enc, nonce, len(payload))
-        ciphertext = bytes(a ^ b for a, b in zip(payload, keystream))
+        if keystream is None:
+            keystream = suite.keystream(key_enc, nonce, len(payload))
+        ciphertext = self.handler.xor(payload, keystream)
 
-        # Compute authentication tag (HMAC)
-        tag = hmac.new(key_mac, aad + nonce + ciphertext, hashlib.sha256).digest()[:self._tag_len]
+        # Compute authentication tag over version (v2+), AAD, nonce and ciphertext
+        tag = suite.tag(key_mac, self._mac_input(suite, version, frame, nonce, ciphertext), self._tag_len)
 
 
-        out_payload = bytes([self._version]) + nonce + ciphertext + tag
+        out_payload = bytes([version]) + nonce + ciphertext + tag
         out_frame = FrameSchema(
             dst_mac=frame.dst_mac,
             src_mac=frame.src_mac,
@@ -63,35 +164,68 @@ class SecurityManager:
 
         # print("security: Se encripto el frame, payload: ", out_payload)
 
+        if frame.dst_mac != BROADCAST_MAC:
+            self.meter.add(frame.dst_mac, "tx", suite, len(payload), time.perf_counter() - started)
         return out_frame
     
     def accept_incoming(self, frame: FrameSchema) -> FrameSchema | None:
         """Verifies and decrypts an incoming protected frame."""
+        if frame.header.message_type == MessageType.SEC_HELLO:
+            self._on_hello(frame)
+            return None
         if not self._should_protect(frame.header.message_type):
             return frame
         
+        started = time.perf_counter()
         data = frame.payload
-        if len(data) < 1 + self._nonce_len + self._tag_len or data[0] != self._version:
-            #Looks like an unprotected payload
+        suite = self.suites.get(data[0] & ~SESSION_FLAG) if data else None
+        if len(data) < 1 + self._nonce_len + self._tag_len or suite is None:
+            #Looks like an unprotected payload (or a suite we do not accept)
             return None
+        version = data[0]
         
         nonce = data[1:1+self._nonce_len]
         tag = data[-self._tag_len:]
         ciphertext  = data[1+self._nonce_len:-self._tag_len]
 
-        # Re-derive encryption and authentication keys
-        k_enc = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"enc", 32)
-        k_mac = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"mac", 32)
+        keys, replay = None, None
+        if version & SESSION_FLAG:
+            # Session keys, looked up by the sid that prefixes the nonce
+            keys = self.sessions.rx(frame.src_mac, nonce[:4])
+            if keys is None:
+                self._send_reset(frame, nonce[:4])
+                return None
+            if keys.suite != suite.version:
+                return None  # not the suite negotiated for this session (downgrade attempt)
+            # Duplicate or too-old counter: drop before spending any MAC/keystream work
+            counter = int.from_bytes(nonce[4:], "big")
+            replay = keys.replay
+            if replay is not None and not replay.check(counter):
+                return None
+            k_enc, k_mac = keys.k_enc, keys.k_mac
+        else:
+            # Re-derive encryption and authentication keys
+            k_enc = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"enc", 32)
+            k_mac = self.handler.hkdf_sha256(self._pre_shared_key, nonce, b"mac", 32)
 
         # Verify authentication tag
-        aad = self.handler.aad_for(frame)
-        exp = hmac.new(k_mac, aad + nonce + ciphertext, hashlib.sha256).digest()[:self._tag_len]
+        exp = suite.tag(k_mac, self._mac_input(suite, version, frame, nonce, ciphertext), self._tag_len)
         if not hmac.compare_digest(tag, exp):
+            if keys is not None:
+                self._note_auth_failure(frame, keys)
             return None  # Invalid tag
+        if keys is not None:
+            keys.auth_failures = 0
+        if replay is not None and not replay.accept(counter):
+            return None  # Same counter verified concurrently by another worker
+        if keys is not None and not keys.confirmed:
+            # The peer really uses this session: only now may it retire older ones
+            with self.sessions.lock:
+                self.sessions.confirm_rx(frame.src_mac, keys)
         
         # Decrypt payload using XOR with generated keystream
-        keystream = self.handler.keystream(k_enc, nonce, len(ciphertext))
-        payload_decrypt = bytes(a ^ b for a, b in zip(ciphertext, keystream))
+        keystream = suite.keystream(k_enc, nonce, len(ciphertext))
+        payload_decrypt = self.handler.xor(ciphertext, keystream)
 
         out_frame = FrameSchema(
             dst_mac=frame.dst_mac,
@@ -107,11 +241,174 @@ class SecurityManager:
 
         # print("security: Se desencripto el frame, payload: ", payload_decrypt)
 
+        if frame.dst_mac != BROADCAST_MAC:
+            self.meter.add(frame.src_mac, "rx", suite, len(payload_decrypt), time.perf_counter() - started)
         return out_frame
 
+    # Sessions
+    #
+    # Handshake, one per direction (A sends to B):
+    #   A -> B  SEC_HELLO role=init sid na suites=3,2,1
+    #   B -> A  SEC_HELLO role=resp sid na nb suite=3
+    # B picks the first suite in its own preference that A offered; both HELLOs are
+    # tagged, so the offer cannot be stripped to force a weaker suite. Peers that predate
+    # suites send no list and get SEC_CIPHER_VERSION.
+    # Both derive k_enc/k_mac = HKDF(PSK, salt=na||nb, info=sid||mac_A||mac_B||label).
+    # HELLOs travel in clear with an HMAC(PSK) tag. A resp only completes the pending
+    # init with the same sid and na, so a replayed resp is ignored. B keeps the keys
+    # from an init provisional until a frame authenticates under them, so a replayed
+    # old init cannot evict the session A is using (see SessionStore). A repeated init
+    # (L2 duplicate or replay) for a sid B already has keys for gets the original resp
+    # again and never re-derives, so it cannot desynchronise a running session.
+    # If B keeps failing tags on a known sid it also answers role=reset.
+    # If B has no keys for a sid (e.g. it restarted) it answers role=reset and A drops
+    # the session and handshakes again.
+
+    def _tx_session(self, frame: FrameSchema) -> Optional[Tuple[SessionKeys, bytes, Optional[bytes]]]:
+        """
+        Active session keys for frame.dst_mac with the next nonce and, if the pool had one,
+        its precomputed keystream. May start a handshake.
+        """
+        if not self._sessions_enabled or self._send is None or frame.dst_mac == BROADCAST_MAC:
+            return None
+        with self.sessions.lock:
+            keys = self.sessions.tx(frame.dst_mac)
+            if self.sessions.needs_rekey(keys):
+                self._start_hello(frame)
+            if keys is None:
+                return None
+            pooled = self.keystream_pool.take(keys, len(frame.payload))
+            if pooled:
+                return keys, pooled[0], pooled[1]
+            return keys, keys.next_nonce(), None
+
+    def _start_hello(self, frame: FrameSchema):
+        now = time.time()
+        pending = self.sessions.pending(frame.dst_mac)
+        if pending and now - pending.sent_ts < min(60.0, self._hello_retry_s * pending.attempts):
+            return
+        hello = PendingHello(
+            sid=secrets.token_bytes(4), my_nonce=secrets.token_bytes(16), sent_ts=now,
+            attempts=pending.attempts + 1 if pending else 1,
+        )
+        self.sessions.set_pending(frame.dst_mac, hello)
+        self._send_hello(frame.src_mac, frame.dst_mac, frame.ethertype,
+                         role="init", sid=hello.sid.hex(), na=hello.my_nonce.hex(),
+                         suites=",".join(map(str, self.preference)))
+
+    def _on_hello(self, frame: FrameSchema):
+        kv = self._open_hello(frame)
+        if kv is None:
+            return
+        try:
+            sid = bytes.fromhex(kv["sid"])
+            na = bytes.fromhex(kv.get("na", ""))
+        except (KeyError, ValueError):
+            return
+        role = kv.get("role")
 
+        if role == "init" and len(sid) == 4 and len(na) == 16:
+            offered = self._parse_suites(kv.get("suites"))
+            suite = negotiate(offered, self.preference) if offered is not None else self._version
+            if suite is None:
+                logging.warning("[Security] No common cipher suite with %s (offered %s)", frame.src_mac, kv.get("suites"))
+                return
+            with self.sessions.lock:
+                keys = self.sessions.rx(frame.src_mac, sid)
+                if keys is None:
+                    if self.sessions.seen_init(na):
+                        return  # replay of a handshake whose session is already gone
+                    nb = secrets.token_bytes(16)
+                    keys = self._derive_session(sid, na, nb, src_mac=frame.src_mac, dst_mac=frame.dst_mac, suite=suite)
+                    keys.na, keys.nb = na, nb
+                    self.sessions.set_rx(frame.src_mac, keys)
+                elif not hmac.compare_digest(keys.na, na):
+                    return  # same sid, different handshake: keep the established keys
+            # New or repeated init: answer with the resp matching the stored keys
+            # (the initiator ignores it if it already completed this handshake)
+            self._send_hello(frame.dst_mac, frame.src_mac, frame.ethertype,
+                             role="resp", sid=sid.hex(), na=na.hex(), nb=keys.nb.hex(), suite=str(keys.suite))
+        elif role == "resp":
+            try:
+                nb = bytes.fromhex(kv.get("nb", ""))
+                suite = int(kv.get("suite", self._version))
+            except ValueError:
+                return
+            if suite not in self.suites:
+                return
+            with self.sessions.lock:
+                pending = self.sessions.pop_pending(frame.src_mac, sid)
+                if pending is None or not hmac.compare_digest(pending.my_nonce, na) or len(nb) != 16:
+                    return
+                keys = self._derive_session(sid, na, nb, src_mac=frame.dst_mac, dst_mac=frame.src_mac, suite=suite)
+                self.sessions.set_tx(frame.src_mac, keys)
+            logging.info("[Security] Session %s established with %s (%s)", sid.hex(), frame.src_mac, self.suites[suite].name)
+        elif role == "reset":
+            with self.sessions.lock:
+                keys = self.sessions.tx(frame.src_mac)
+                if keys and keys.sid == sid:
+                    self.sessions.drop_tx(frame.src_mac)
+                    logging.info("[Security] Session %s reset by %s", sid.hex(), frame.src_mac)
 
+    def _note_auth_failure(self, frame: FrameSchema, keys: SessionKeys):
+        """Counts tag failures on a known sid; past the limit the peer is told to re-handshake."""
+        keys.auth_failures += 1
+        if keys.auth_failures >= self._auth_fail_reset:
+            keys.auth_failures = 0
+            self._send_reset(frame, keys.sid)
 
+    def _send_reset(self, frame: FrameSchema, sid: bytes):
+        # At most one reset per peer per second
+        now = time.time()
+        if self._send is None or now - self._reset_sent.get(frame.src_mac, 0.0) < 1.0:
+            return
+        self._reset_sent[frame.src_mac] = now
+        self._send_hello(frame.dst_mac, frame.src_mac, frame.ethertype, role="reset", sid=sid.hex())
 
+    @staticmethod
+    def _parse_suites(spec: Optional[str]) -> Optional[list]:
+        """Suite list from an init HELLO; None when the peer predates suite negotiation."""
+        if spec is None:
+            return None
+        try:
+            return [int(part) for part in spec.split(",") if part.strip()]
+        except ValueError:
+            return []
 
-    
\ No newline at end of file
+    def _derive_session(self, sid: bytes, na: bytes, nb: bytes, src_mac: str, dst_mac: str, suite: int) -> SessionKeys:
+        info = b"linkchat-session|" + sid + bytes.fromhex(src_mac.replace(":", "")) + bytes.fromhex(dst_mac.replace(":", ""))
+        salt = na + nb
+        return SessionKeys(
+            sid=sid,
+            k_enc=self.handler.hkdf_sha256(self._pre_shared_key, salt, info + b"|enc", 32),
+            k_mac=self.handler.hkdf_sha256(self._pre_shared_key, salt, info + b"|mac", 32),
+            suite=suite,
+        )
+
+    def _hello_tag(self, src_mac: str, dst_mac: str, body: bytes) -> bytes:
+        msg = b"sec-hello|" + src_mac.encode() + b"|" + dst_mac.encode() + b"|" + body
+        return hmac.new(self._pre_shared_key, msg, hashlib.sha256).digest()[:self._tag_len]
+
+    def _send_hello(self, src_mac: str, dst_mac: str, ethertype: int, **fields: str):
+        body = "".join(f"{k}={v}\n" for k, v in fields.items()).encode("utf-8")
+        payload = body + b"tag=" + self._hello_tag(src_mac, dst_mac, body).hex().encode() + b"\n"
+        self._send(FrameSchema(
+            dst_mac=dst_mac,
+            src_mac=src_mac,
+            ethertype=ethertype,
+            header=HeaderSchema(message_type=MessageType.SEC_HELLO, sequence=0, payload_len=len(payload)),
+            payload=payload,
+        ))
+
+    def _open_hello(self, frame: FrameSchema) -> Optional[dict]:
+        """Parses a SEC_HELLO and checks its PSK tag; None if forged or malformed."""
+        body, sep, tag_line = frame.payload.rpartition(b"tag=")
+        if not sep:
+            return None
+        try:
+            tag = bytes.fromhex(tag_line.strip().decode("ascii"))
+        except ValueError:
+            return None
+        if not hmac.compare_digest(tag, self._hello_tag(frame.src_mac, frame.dst_mac, body)):
+            return None
+        return parse_payload(body.decode("utf-8", errors="replace"))
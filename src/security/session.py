@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.security.replay_window import ReplayWindow
+
+
+@dataclass
+class SessionKeys:
+    """Keys for one direction (src -> dst) of a peer session."""
+    sid: bytes                  # 4-byte session id, first half of every frame nonce
+    k_enc: bytes
+    k_mac: bytes
+    suite: int = 2              # negotiated cipher suite (version byte)
+    created_ts: float = field(default_factory=time.time)
+    counter: int = 0            # next 64-bit frame counter (sender side)
+    frames: int = 0
+    replay: Optional[ReplayWindow] = field(default=None, repr=False)   # receiver side only
+    # Receiver side: the handshake nonces, so a repeated init gets the same resp back
+    na: bytes = field(default=b"", repr=False)
+    nb: bytes = field(default=b"", repr=False)
+    auth_failures: int = 0      # consecutive tag failures on this sid (receiver side)
+    confirmed: bool = False     # receiver side: a frame has authenticated under these keys
+
+    def next_nonce(self) -> bytes:
+        """12-byte nonce = sid(4) || counter(8, big endian)."""
+        nonce = self.sid + self.counter.to_bytes(8, "big")
+        self.counter += 1
+        self.frames += 1
+        return nonce
+
+
+@dataclass
+class PendingHello:
+    sid: bytes
+    my_nonce: bytes
+    sent_ts: float
+    attempts: int = 1
+
+
+class SessionStore:
+    """
+    Per-peer session key cache.
+
+    tx[dst_mac]  -> keys we encrypt with towards that peer (one active session).
+    rx[(src_mac, sid)] -> keys for frames that peer sends us; the previous session
+    stays valid until it expires so frames in flight during a rekey still decrypt.
+
+    A new rx session is provisional until a frame authenticates under it
+    (confirm_rx). Only then does it retire older sessions. An init HELLO (even a
+    replayed one) can only replace the provisional slot and never evicts a session
+    the peer is actually using. Init nonces already answered are remembered
+    (seen_init), so replaying a recent handshake does not even take that slot.
+    """
+    SEEN_INITS = 1024
+
+    def __init__(self, ttl_s: float = 3600.0, rekey_frames: int = 1 << 20, replay_window: int = 1024):
+        self.ttl_s = ttl_s
+        self.rekey_frames = rekey_frames
+        self.replay_window = replay_window    # 0 disables the anti-replay filter
+        self._tx: Dict[str, SessionKeys] = {}
+        self._rx: Dict[Tuple[str, bytes], SessionKeys] = {}
+        self._pending: Dict[str, PendingHello] = {}
+        self._seen_na: "OrderedDict[bytes, None]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    # tx side
+    def tx(self, dst_mac: str) -> Optional[SessionKeys]:
+        keys = self._tx.get(dst_mac)
+        if keys and time.time() - keys.created_ts >= self.ttl_s:
+            # Expired: fall back to per-frame keys until the new handshake completes
+            self._tx.pop(dst_mac, None)
+            return None
+        return keys
+
+    def needs_rekey(self, keys: Optional[SessionKeys]) -> bool:
+        if keys is None:
+            return True
+        return keys.frames >= self.rekey_frames or time.time() - keys.created_ts >= 0.9 * self.ttl_s
+
+    def set_tx(self, dst_mac: str, keys: SessionKeys):
+        self._tx[dst_mac] = keys
+
+    def drop_tx(self, dst_mac: str):
+        self._tx.pop(dst_mac, None)
+
+    def active_tx(self) -> List[SessionKeys]:
+        now = time.time()
+        return [k for k in self._tx.values() if now - k.created_ts < self.ttl_s]
+
+    # handshake bookkeeping
+    def pending(self, dst_mac: str) -> Optional[PendingHello]:
+        return self._pending.get(dst_mac)
+
+    def set_pending(self, dst_mac: str, hello: PendingHello):
+        self._pending[dst_mac] = hello
+
+    def pop_pending(self, dst_mac: str, sid: bytes) -> Optional[PendingHello]:
+        hello = self._pending.get(dst_mac)
+        if hello is None or hello.sid != sid:
+            return None
+        return self._pending.pop(dst_mac)
+
+    # rx side
+    def rx(self, src_mac: str, sid: bytes) -> Optional[SessionKeys]:
+        keys = self._rx.get((src_mac, sid))
+        if keys and time.time() - keys.created_ts >= self.ttl_s * 1.1:
+            self._rx.pop((src_mac, sid), None)
+            return None
+        return keys
+
+    def set_rx(self, src_mac: str, keys: SessionKeys):
+        """Adds a provisional session; it replaces the peer's previous provisional one only."""
+        now = time.time()
+        for key, old in list(self._rx.items()):
+            if (key[0] == src_mac and not old.confirmed) or now - old.created_ts >= self.ttl_s * 1.1:
+                self._rx.pop(key, None)
+        if self.replay_window > 0 and keys.replay is None:
+            keys.replay = ReplayWindow(self.replay_window)
+        self._rx[(src_mac, keys.sid)] = keys
+        if keys.na:
+            self._seen_na[keys.na] = None
+            while len(self._seen_na) > self.SEEN_INITS:
+                self._seen_na.popitem(last=False)
+
+    def confirm_rx(self, src_mac: str, keys: SessionKeys):
+        """
+        First authenticated frame on `keys`: it becomes the current session. The newest
+        older confirmed session stays for frames in flight during the rekey; the rest go.
+        """
+        keys.confirmed = True
+        older = sorted(
+            (kv for kv in self._rx.items()
+             if kv[0][0] == src_mac and kv[1] is not keys and kv[1].created_ts <= keys.created_ts),
+            key=lambda kv: kv[1].created_ts,
+        )
+        keep = next((key for key, old in reversed(older) if old.confirmed), None)
+        for key, _old in older:
+            if key != keep:
+                self._rx.pop(key, None)
+
+    def seen_init(self, na: bytes) -> bool:
+        return na in self._seen_na
+
+    def replay_stats(self) -> Dict[str, dict]:
+        """Frames dropped by the replay windows, summed per sending peer."""
+        out: Dict[str, dict] = {}
+        for (mac, _sid), keys in self._rx.items():
+            if keys.replay is None:
+                continue
+            peer = out.setdefault(mac, {"duplicates": 0, "too_old": 0})
+            peer["duplicates"] += keys.replay.duplicates
+            peer["too_old"] += keys.replay.too_old
+        return out
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = time.time()
+        return {
+            mac: {"sid": k.sid.hex(), "suite": k.suite, "frames": k.frames, "age_s": round(now - k.created_ts, 1)}
+            for mac, k in self._tx.items()
+        }
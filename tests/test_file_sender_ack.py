@@ -0,0 +1,105 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.enums.enums import MessageType  # noqa: E402
+from src.core.helpers.bitset import ChunkBitset  # noqa: E402
+from src.core.managers.link_stats import LinkStatsTable  # noqa: E402
+from src.core.schemas.frame_schemas import FrameSchema, HeaderSchema  # noqa: E402
+from src.file_transfer.file_sender import FileSender  # noqa: E402
+from src.file_transfer.schemas.send_ctx import FileSendCtxSchema  # noqa: E402
+
+DST = "02:00:00:00:00:0b"
+CHUNK = 1200
+
+
+class _Threads:
+    """Lo mínimo de ThreadManager que usa FileSender._on_ack."""
+    def __init__(self):
+        self.handlers = {}
+        self.ctxs = {}
+        self.link_stats = LinkStatsTable()
+
+    def add_message_handler(self, msg_type, f):
+        self.handlers[msg_type] = f
+
+    def get_message_handler(self, msg_type):
+        return self.handlers.get(msg_type)
+
+    def get_ctx_by_id(self, file_id):
+        return self.ctxs.get(file_id)
+
+
+def _sender(total_chunks: int):
+    threads = _Threads()
+    sender = FileSender(threads, CHUNK)
+    ctx = FileSendCtxSchema(
+        file_id="f", dst_mac=DST, path="f", size=total_chunks * CHUNK - 100,
+        hash_sha256_hex="0" * 64, chunk_size=CHUNK, total_chunks=total_chunks,
+    )
+    threads.ctxs["f"] = ctx
+    return sender, ctx
+
+
+def _ack(next_needed: int, src: str = DST) -> FrameSchema:
+    payload = f"file_id=f\nnext_needed={next_needed}\nrwnd=8\n".encode("utf-8")
+    return FrameSchema(
+        dst_mac="02:00:00:00:00:0a", src_mac=src, ethertype=0x88B5,
+        header=HeaderSchema(message_type=MessageType.ACK, sequence=1, payload_len=len(payload)),
+        payload=payload,
+    )
+
+
+def test_ack_cost_does_not_grow_with_acked_prefix(monkeypatch):
+    touched = []
+    set_range = ChunkBitset.set_range
+
+    def counting_set_range(self, start, stop):
+        touched.append(max(0, min(stop, self.size) - max(0, start)))
+        return set_range(self, start, stop)
+
+    monkeypatch.setattr(ChunkBitset, "set_range", counting_set_range)
+    sender, ctx = _sender(total_chunks=5_000_000)
+
+    sender._on_ack(_ack(16))
+    sender._on_ack(_ack(4_450_000))
+    touched.clear()
+    for next_needed in range(4_450_016, 4_450_016 + 16 * 10, 16):
+        sender._on_ack(_ack(next_needed))
+
+    # Cada ACK recorre solo los 16 chunks nuevos, no los ~4.45M ya confirmados
+    assert touched == [16] * 10
+    assert ctx.last_acked == 4_450_016 + 16 * 9 - 1
+    assert len(ctx.acked) == ctx.last_acked + 1
+
+
+def test_ack_next_needed_is_clamped_to_total_chunks():
+    sender, ctx = _sender(total_chunks=10)
+    sender._on_ack(_ack(1 << 40))
+    assert ctx.last_acked == 9
+    assert len(ctx.acked) == 10
+
+    sender._on_ack(_ack(-5))
+    assert ctx.last_acked == 9
+
+
+def test_ack_from_other_mac_is_ignored():
+    sender, ctx = _sender(total_chunks=10)
+    sender._on_ack(_ack(10, src="02:00:00:00:00:66"))
+    assert ctx.last_acked == -1
+    assert len(ctx.acked) == 0
+    assert ctx.rwnd == -1
+
+
+def test_ack_credits_actual_bytes_of_short_last_chunk(monkeypatch):
+    sender, ctx = _sender(total_chunks=3)
+    credited = []
+    monkeypatch.setattr(sender.service_threads.link_stats, "on_acked", lambda mac, n: credited.append(n))
+
+    sender._on_ack(_ack(2))
+    sender._on_ack(_ack(3))
+    sender._on_ack(_ack(3))     # repetido: nada nuevo que acreditar
+
+    assert credited == [2 * CHUNK, CHUNK - 100]
+    assert sum(credited) == ctx.size
@@ -210,6 +210,16 @@ def run(
 
         _update_msg_subtitle(msg, subtitle)
 
+    def on_file_tx_state(ev: dict):
+        msg = _resolve_msg_for_event_tx(ev)
+        if not msg:
+            return
+        fid = ev.get("file_id")
+        if fid:
+            _touch_tx(fid)
+        if ev.get("state") == "meta_pending":
+            _update_msg_subtitle(msg, "Esperando receptor…")
+
     def on_file_tx_finished(ev: dict):
         msg = _resolve_msg_for_event_tx(ev)
         if msg:
@@ -365,6 +375,7 @@ def run(
 
     # Suscripciones a eventos de archivo
     pump.subscribe("file_tx_started",  on_file_tx_started)
+    pump.subscribe("file_tx_state",    on_file_tx_state)
     pump.subscribe("file_tx_progress", on_file_tx_progress)
     pump.subscribe("file_tx_finished", on_file_tx_finished)
     pump.subscribe("file_tx_done",     on_file_tx_done)  
@@ -34,7 +34,8 @@ async def main():
 
     #  Event Pump y suscripciones 
     pump = EventPump()
-    pump.subscribe("neighbors_changed", roster.on_neighbors_changed)
+    pump.subscribe("neighbors_changed", roster.on_neighbors_changed)   # snapshot completo
+    pump.subscribe("neighbors_diff",    roster.on_neighbors_diff)      # cambios incrementales
     pump.subscribe("chat",               chat.on_chat)
 
     # Fallback q ignora respuestas sin type
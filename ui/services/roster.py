@@ -10,23 +10,60 @@ class RosterService:
     selected_mac: Optional[str] = None
     _idx: Dict[str,int] = field(default_factory=dict)
 
+    _rev: int = -1
+
     async def bootstrap(self):
         await self.bridge.send_cmd({"type":"neighbors_get"})
 
     def on_neighbors_changed(self, evt: dict):
+        """Snapshot completo (respuesta a neighbors_get): reemplaza la tabla."""
         rows = evt.get("rows", [])
+        keep = set()
         for r in rows:
-            print('El tipo de r es:',r)
-            mac = r.get("mac"); alias = r.get("alias") or "?"
-            online = (r.get("last_seen_ms", 1e9) < 10_000)
-            if mac in self._idx:
-                i = self._idx[mac]
-                c = self.contacts[i]
-                c.name = alias; c.online = online
+            mac = r.get("mac")
+            if not mac:
+                continue
+            keep.add(mac)
+            # "online" lo decide el backend; last_seen_ms queda para backends viejos
+            online = r.get("online", r.get("last_seen_ms", 1e9) < 10_000)
+            self._upsert(mac, r.get("alias") or "?", online)
+        self.contacts = [c for c in self.contacts if c.mac in keep]
+        self._rev = evt.get("rev", self._rev)
+        self._reorder()
+
+    def on_neighbors_diff(self, evt: dict):
+        """Cambios incrementales (add/update/remove); ante un hueco de revisión pide resync."""
+        rev = evt.get("rev")
+        if self._rev >= 0 and rev is not None and rev != self._rev + 1:
+            if rev > self._rev:
+                self.bridge.send_cmd_threadsafe({"type":"neighbors_get"})
+            return
+        for ch in evt.get("changes", []):
+            mac = ch.get("mac")
+            if not mac:
+                continue
+            if ch.get("op") == "remove":
+                self.contacts = [c for c in self.contacts if c.mac != mac]
             else:
-                self._idx[mac] = len(self.contacts)
-                self.contacts.append(Contact(mac=mac, name=alias, online=online))
+                self._upsert(mac, ch.get("alias") or "?", bool(ch.get("online")))
+        if rev is not None:
+            self._rev = rev
+        self._reorder()
+
+    def _upsert(self, mac: str, alias: str, online: bool):
+        if mac in self._idx and self._idx[mac] < len(self.contacts) and self.contacts[self._idx[mac]].mac == mac:
+            c = self.contacts[self._idx[mac]]
+            c.name = alias; c.online = online
+        else:
+            self._idx[mac] = len(self.contacts)
+            self.contacts.append(Contact(mac=mac, name=alias, online=online))
+
+    def _reorder(self):
         self.contacts.sort(key=lambda c: (not c.online, c.name.lower()))
+        # el índice apunta a la posición tras ordenar (antes quedaba desfasado)
+        self._idx = {c.mac: i for i, c in enumerate(self.contacts)}
+        if self.selected_mac not in self._idx and self.selected_mac != "__ALL__":
+            self.selected_mac = None
         if not self.selected_mac and self.contacts:
             self.selected_mac = self.contacts[0].mac
 